@@ -17,6 +17,12 @@ TT = True
 DEPTH = 2
 QUIESENCE = True
 SOFT_BOUNDS = True
+PVS = True
+NULL_MOVE = True
+LMR = True
+
+# profiling of the search: None (CANNON_PROFILE of the environment), "off", "cprofile" or "sample"
+PROFILE = None
 
 
 # create and start the Cannon game application
@@ -53,7 +59,11 @@ if not LOAD_SAVED:
         use_tt=TT,
         always_sort=True,
         quiesence=QUIESENCE,
-        soft_bounds=SOFT_BOUNDS)
+        soft_bounds=SOFT_BOUNDS,
+        pvs=PVS,
+        null_move=NULL_MOVE,
+        lmr=LMR,
+        profile=PROFILE)
 
     dark = lambda p, c: AlphaBeta(
         player=p, 
@@ -66,7 +76,10 @@ if not LOAD_SAVED:
         use_tt=True,
         always_sort=True,
         quiesence=True,
-        soft_bounds=True)
+        soft_bounds=True,
+        pvs=True,
+        null_move=True,
+        lmr=True)
 
     app.set_player(PlayerType.LIGHT, light)
     app.set_player(PlayerType.DARK, dark)
@@ -0,0 +1,120 @@
+"""
+Opt-in profiling of the search. The mode is given by the configuration of the AI or by
+the environment variable CANNON_PROFILE:
+ - off: no profiling, the default
+ - cprofile: the deterministic profiler, the stats of each move are dumped to a .prof file
+ - sample: a thread samples the stack of the search, the samples of all moves are written
+   as collapsed stacks (one "frame;frame;frame count" per line) for flamegraphs
+The files are written to the directory CANNON_PROFILE_DIR, by default "profiles".
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+PROFILE_ENV = "CANNON_PROFILE"
+PROFILE_DIR_ENV = "CANNON_PROFILE_DIR"
+PROFILE_DIR = "profiles"
+
+# the interval of the sampling profiler in seconds, a thread can not run much more
+# often than the interpreter switches between threads (5 ms)
+SAMPLE_INTERVAL = 0.005
+
+# the profiles are numbered and the samples are collected per process, so the files of
+# AIs created one after another (e.g. in the headless games) do not overwrite each other
+_profiles = 0
+_stacks = dict()
+
+
+class Profiler:
+
+    OFF = "off"
+    CPROFILE = "cprofile"
+    SAMPLE = "sample"
+
+    def __init__(self, mode: str = None, name: str = "search", directory: str = None,
+                    interval: float = SAMPLE_INTERVAL) -> None:
+        """
+        Profiles the code run in profile(). Without a mode the mode of the environment
+        is used. The name is the start of the file names, the process id is added so
+        processes of a pool do not overwrite each other's files.
+        """
+        mode = mode or os.environ.get(PROFILE_ENV) or Profiler.OFF
+        if mode not in (Profiler.OFF, Profiler.CPROFILE, Profiler.SAMPLE):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+
+        self._mode = mode
+        self._name = f"{name}-{os.getpid()}"
+        self._directory = directory or os.environ.get(PROFILE_DIR_ENV) or PROFILE_DIR
+        self._interval = interval
+
+        # the collapsed stacks of all moves and the amount of samples of each
+        self._stacks = _stacks.setdefault(self._name, dict())
+
+    def get_mode(self) -> str:
+        return self._mode
+
+    def profile(self):
+        """
+        Returns a context manager profiling the code run within, e.g. the search of a move.
+        """
+        if self._mode == Profiler.OFF:
+            return nullcontext()
+
+        os.makedirs(self._directory, exist_ok=True)
+
+        if self._mode == Profiler.CPROFILE:
+            return self._profile_cprofile()
+        return self._profile_sample()
+
+    @contextmanager
+    def _profile_cprofile(self):
+        global _profiles
+        _profiles += 1
+        path = os.path.join(self._directory, f"{self._name}-{_profiles:04d}.prof")
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(path)
+
+    @contextmanager
+    def _profile_sample(self):
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), stop),
+                                    name="SampleProfiler", daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+            self._write_stacks()
+
+    def _sample(self, thread_id: int, stop: threading.Event) -> None:
+        """
+        Records the stack of the given thread every interval until stop is set.
+        """
+        while not stop.wait(self._interval):
+            frame = sys._current_frames().get(thread_id)
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            # the root of the stack comes first
+            key = ";".join(reversed(stack))
+            self._stacks[key] = self._stacks.get(key, 0) + 1
+
+    def _write_stacks(self) -> None:
+        with open(os.path.join(self._directory, f"{self._name}.folded"), "w") as f:
+            for stack, count in self._stacks.items():
+                f.write(f"{stack} {count}\n")
@@ -1,9 +1,80 @@
-from os import stat
-import numpy as np
+import csv
+import json
+import math
+import os
 
 from stupid_engine.cannon.entities.player import PlayerType
 
 
+class RunningStat:
+    def __init__(self) -> None:
+        """
+        Keeps the amount, sum, minimum and maximum of a series of values, so the average
+        is known without storing the values.
+        """
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def add(self, value) -> None:
+        if self.count == 0:
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+        self.count += 1
+        self.total += value
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+
+class StatisticsWriter:
+
+    JSONL = "jsonl"
+    CSV = "csv"
+
+    # columns of the csv format, the iterations are written as "depth:nodes:time" separated by spaces
+    CSV_COLUMNS = ["player", "move", "score", "depth", "time", "nodes", "tt_stored", "tt_loaded",
+                    "cutoffs", "first_move_cutoffs", "root_pruning", "subroot_pruning", "iterations"]
+
+    def __init__(self, path: str, format: str = None) -> None:
+        """
+        Appends the record of each move to a file as JSON lines or CSV, by default the
+        format is given by the extension of the file. Every record is written at once, so
+        multiple processes can share a file.
+        """
+        self._format = format or (StatisticsWriter.CSV if path.endswith(".csv") else StatisticsWriter.JSONL)
+        if self._format not in (StatisticsWriter.JSONL, StatisticsWriter.CSV):
+            raise ValueError(f"Unknown format of the statistics: {self._format}")
+
+        self._path = path
+        self._file = open(path, "a", newline="")
+        self._csv = None
+
+        if self._format == StatisticsWriter.CSV:
+            self._csv = csv.DictWriter(self._file, StatisticsWriter.CSV_COLUMNS)
+            if self._file.tell() == 0:
+                self._csv.writeheader()
+
+    def get_path(self) -> str:
+        return self._path
+
+    def write(self, record: dict) -> None:
+        if self._csv:
+            row = dict(record, iterations=" ".join(f"{d}:{n}:{t:.4f}" for d, n, t in record["iterations"]))
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
 class Statistics:
 
     ROOT_PRUNING = "roopru"
@@ -11,6 +82,7 @@ class Statistics:
     MIN_SUBROOT_PRUNING = "minsub"
     MAX_SUBROOT_PRUNING = "maxsub"
     AVERAGE_PRUNING = "avepru"
+    FIRST_MOVE_CUTOFFS = "fircut"
 
     AMOUNT_OF_MOVES = "amomov"
     TOTAL_SCORE = "totsco"
@@ -24,144 +96,173 @@ class Statistics:
     MOVES_STORED = "movsto"
     MOVES_LOADED = "movload"
 
-    def __init__(self, player_type: PlayerType) -> None:
+    def __init__(self, player_type: PlayerType, writer: StatisticsWriter = None) -> None:
+        """
+        Collects the statistics of the searches of a player. Only running aggregates are
+        kept, so the memory does not grow with the length of the game. After each move
+        update() closes the record of the move, it is passed to the optional writer.
+        """
         self._player_type = player_type
+        self._writer = writer
         self._index = 0
 
-        # create variables for the amount of pruning
-        self._root_pruning = []
-        self._sub_root_pruning = []
-        self._pruning = []
+        # the amount of pruning per move
+        self._root_pruning = RunningStat()
+        self._sub_root_pruning = RunningStat()
+        self._pruning = RunningStat()
+
+        # the quality of the move ordering
+        self._cutoffs = 0
+        self._first_move_cutoffs = 0
 
-        # create variables for the amount of moves calculated
-        self._moves = []
+        # the scores of the moves played
+        self._moves = RunningStat()
 
-        # create variables for the amount of time for each ply
-        # and how many plys were calculated
-        self._plys = []
-        self._time_plys = []
+        # the depth reached for each move and the depth per second
+        self._plys = RunningStat()
+        self._time_plys = RunningStat()
 
         # statistics for iterative deepening / transposition table
-        self._moves_in_tt = []
-        self._moves_restored_tt = []
+        self._moves_in_tt = 0
+        self._moves_restored_tt = 0
 
-    def add_pruning(self, root_node) -> None:
-        if len(self._root_pruning) <= self._index:
-            self._root_pruning.append(0)
-            self._sub_root_pruning.append(0)
+        # the counters of the current move and the record of the last move
+        self._record = None
+        self._last_record = None
+        self._reset_record()
+
+    def _reset_record(self) -> None:
+        self._record = {"player": self._player_type, "move": self._index, "score": None, "depth": 0,
+                        "time": 0, "nodes": 0, "tt_stored": 0, "tt_loaded": 0, "cutoffs": 0,
+                        "first_move_cutoffs": 0, "root_pruning": 0, "subroot_pruning": 0, "iterations": []}
 
+    def set_writer(self, writer: StatisticsWriter) -> None:
+        self._writer = writer
+
+    def get_writer(self) -> StatisticsWriter:
+        return self._writer
+
+    def add_pruning(self, root_node) -> None:
         if root_node:
-            self._root_pruning[self._index] += 1
+            self._record["root_pruning"] += 1
         else:
-            self._sub_root_pruning[self._index] += 1
-    
+            self._record["subroot_pruning"] += 1
+
+    def add_cutoff(self, first_move: bool) -> None:
+        self._cutoffs += 1
+        self._record["cutoffs"] += 1
+        if first_move:
+            self._first_move_cutoffs += 1
+            self._record["first_move_cutoffs"] += 1
+
     def add_move(self, score: int) -> None:
-        if np.inf == np.abs(score):
+        if math.isinf(score):
             return
 
-        self._moves.append(score)
-    
-    def add_ply(self, depth_searched: int, time_needed: int) -> None:
-        self._plys.append(depth_searched)
-        self._time_plys.append(time_needed)
-    
+        self._moves.add(score)
+        self._record["score"] = score
+
+    def add_ply(self, depth_searched: int, time_needed: float, nodes: int = 0) -> None:
+        self._plys.add(depth_searched)
+        if time_needed:
+            self._time_plys.add(depth_searched / time_needed)
+
+        self._record["depth"] = depth_searched
+        self._record["time"] = time_needed
+        self._record["nodes"] = nodes
+
+    def add_iteration(self, depth: int, nodes: int, time_needed: float) -> None:
+        """
+        Adds a completed iteration of the iterative deepening to the record of the move,
+        the nodes and the time are counted from the start of the search.
+        """
+        self._record["iterations"].append((depth, nodes, time_needed))
+
     def add_move_stored(self, score) -> None:
-        self._moves_in_tt.append(score)
+        self._moves_in_tt += 1
+        self._record["tt_stored"] += 1
 
     def add_move_loaded(self, score) -> None:
-        self._moves_restored_tt.append(score)
+        self._moves_restored_tt += 1
+        self._record["tt_loaded"] += 1
+
+    def get_last_move(self) -> dict:
+        """
+        Returns the record of the last move, or None before the first move.
+        """
+        return self._last_record
 
     def get(self, key: str = None):
         stats = dict()
 
         # pruning stats
-        min_sub = max_sub = avg_sub = avg_root = avg_pru = 0
-
-        if len(self._sub_root_pruning) > 0:
-            min_sub = np.min(self._sub_root_pruning)
-            max_sub = np.max(self._sub_root_pruning)
-            avg_sub = np.average(self._sub_root_pruning)
-
-        if len(self._root_pruning) > 0:
-            avg_root = np.average(self._root_pruning)
-        
-        if len(self._pruning) > 0:
-            avg_pru = np.average(self._pruning)
-
-        stats[Statistics.ROOT_PRUNING] = avg_root
-        stats[Statistics.MIN_SUBROOT_PRUNING] = min_sub
-        stats[Statistics.MAX_SUBROOT_PRUNING] = max_sub
-        stats[Statistics.AVERAGE_SUBROOT_PRUNING] = avg_sub
-        stats[Statistics.AVERAGE_PRUNING] = avg_pru
+        stats[Statistics.ROOT_PRUNING] = self._root_pruning.mean()
+        stats[Statistics.MIN_SUBROOT_PRUNING] = self._sub_root_pruning.min
+        stats[Statistics.MAX_SUBROOT_PRUNING] = self._sub_root_pruning.max
+        stats[Statistics.AVERAGE_SUBROOT_PRUNING] = self._sub_root_pruning.mean()
+        stats[Statistics.AVERAGE_PRUNING] = self._pruning.mean()
+        stats[Statistics.FIRST_MOVE_CUTOFFS] = self._first_move_cutoffs / self._cutoffs if self._cutoffs else 0
 
         # moves stats
-        amount_mov = total_score = total_score_norm = 0
-        if len(self._moves) > 0:
-            amount_mov = len(self._moves)
-            total_score = np.sum(self._moves)
-            total_score_norm = total_score / amount_mov
-
-        stats[Statistics.AMOUNT_OF_MOVES] = amount_mov
-        stats[Statistics.TOTAL_SCORE] = total_score
-        stats[Statistics.TOTAL_SCORE_NORMALIZED] = total_score_norm
+        stats[Statistics.AMOUNT_OF_MOVES] = self._moves.count
+        stats[Statistics.TOTAL_SCORE] = self._moves.total
+        stats[Statistics.TOTAL_SCORE_NORMALIZED] = self._moves.mean()
 
         # iterative deepening / ply stats
-        min_ply = max_ply = avg_ply = avg_time = 0
-        if len(self._plys) > 0:
-            min_ply = np.min(self._plys)
-            max_ply = np.max(self._plys)
-            avg_ply = np.average(self._plys)
-            avg_time = np.average(np.asarray(self._plys) / np.asarray(self._time_plys))
-
-        stats[Statistics.MIN_PLY] = min_ply
-        stats[Statistics.MAX_PLY] = max_ply
-        stats[Statistics.AVERAGE_PLYS] = avg_ply
-        stats[Statistics.AVERAGE_TIME_PER_PLY] = avg_time
-
-        stored_moves = loaded_moves = 0
-        if len(self._moves_in_tt) > 0:
-            stored_moves = len(self._moves_in_tt)
-        if len(self._moves_restored_tt) > 0:
-            loaded_moves = len(self._moves_restored_tt)
-        
-        stats[Statistics.MOVES_LOADED] = loaded_moves
-        stats[Statistics.MOVES_STORED] = stored_moves
+        stats[Statistics.MIN_PLY] = self._plys.min
+        stats[Statistics.MAX_PLY] = self._plys.max
+        stats[Statistics.AVERAGE_PLYS] = self._plys.mean()
+        stats[Statistics.AVERAGE_TIME_PER_PLY] = self._time_plys.mean()
+
+        stats[Statistics.MOVES_LOADED] = self._moves_restored_tt
+        stats[Statistics.MOVES_STORED] = self._moves_in_tt
 
         if not key:
             return stats
-        
+
         return stats[key]
-    
+
     def get_printable(self, key: str = None) -> str:
         s = ""
         if not key:
+            stats = self.get()
             s = f"Player: {self._player_type}\n" + \
-                f"Amount of moves: \t{self.get(Statistics.AMOUNT_OF_MOVES)}\n" + \
-                f"Total score: \t\t{self.get(Statistics.TOTAL_SCORE)}\n" + \
+                f"Amount of moves: \t{stats[Statistics.AMOUNT_OF_MOVES]}\n" + \
+                f"Total score: \t\t{stats[Statistics.TOTAL_SCORE]}\n" + \
                 f"Depth for move:\n" + \
-                f"\tavg:\t\t{self.get(Statistics.AVERAGE_PLYS)}\n" + \
-                f"\tmin:\t\t{self.get(Statistics.MIN_PLY)}\n" + \
-                f"\tmax:\t\t{self.get(Statistics.MAX_PLY)}\n" + \
-                f"\ttime:\t\t{self.get(Statistics.AVERAGE_TIME_PER_PLY)}\n" + \
+                f"\tavg:\t\t{stats[Statistics.AVERAGE_PLYS]}\n" + \
+                f"\tmin:\t\t{stats[Statistics.MIN_PLY]}\n" + \
+                f"\tmax:\t\t{stats[Statistics.MAX_PLY]}\n" + \
+                f"\ttime:\t\t{stats[Statistics.AVERAGE_TIME_PER_PLY]}\n" + \
                 f"Transposition Table: \n" + \
-                f"\tStored moves:\t{self.get(Statistics.MOVES_STORED)}\n" + \
-                f"\tLoaded moves:\t{self.get(Statistics.MOVES_LOADED)}\n" + \
-                f"Root pruning: \t\t{self.get(Statistics.ROOT_PRUNING)}\n" + \
+                f"\tStored moves:\t{stats[Statistics.MOVES_STORED]}\n" + \
+                f"\tLoaded moves:\t{stats[Statistics.MOVES_LOADED]}\n" + \
+                f"Root pruning: \t\t{stats[Statistics.ROOT_PRUNING]}\n" + \
                 f"Subroot pruning:\n" + \
-                f"\tavg: \t\t{self.get(Statistics.AVERAGE_SUBROOT_PRUNING)}\n" + \
-                f"\tmin: \t\t{self.get(Statistics.MIN_SUBROOT_PRUNING)}\n" + \
-                f"\tmax: \t\t{self.get(Statistics.MAX_SUBROOT_PRUNING)}\n" + \
-                f"Average pruning: \t{self.get(Statistics.AVERAGE_PRUNING)}\n"
-        
+                f"\tavg: \t\t{stats[Statistics.AVERAGE_SUBROOT_PRUNING]}\n" + \
+                f"\tmin: \t\t{stats[Statistics.MIN_SUBROOT_PRUNING]}\n" + \
+                f"\tmax: \t\t{stats[Statistics.MAX_SUBROOT_PRUNING]}\n" + \
+                f"Average pruning: \t{stats[Statistics.AVERAGE_PRUNING]}\n" + \
+                f"First move cut offs: \t{stats[Statistics.FIRST_MOVE_CUTOFFS]}\n"
+
         return s
 
     def update(self) -> None:
-        i = self._index
+        """
+        Closes the record of the current move: the pruning of the move is added to the
+        aggregates and the record is passed to the writer.
+        """
+        record = self._record
+        root, sub_root = record["root_pruning"], record["subroot_pruning"]
 
         # calculated the amount of pruning
-        if len(self._sub_root_pruning) > i and self._sub_root_pruning[i] != 0:
-            self._pruning.append(self._root_pruning[i] / self._sub_root_pruning[i])
-        else:
-            self._pruning.append(0)
+        self._root_pruning.add(root)
+        self._sub_root_pruning.add(sub_root)
+        self._pruning.add(root / sub_root if sub_root else 0)
+
+        if self._writer:
+            self._writer.write(record)
 
-        self._index += 1
\ No newline at end of file
+        self._last_record = record
+        self._index += 1
+        self._reset_record()
@@ -18,6 +18,18 @@ class BaseAI:
     def play_turn(self, state: Dict) -> bool:
         raise NotImplemented
     
+    def set_ponder(self, ponder: bool) -> None:
+        """
+        Allows or forbids thinking during the opponent's turn, only some AIs do so.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Frees the resources of the AI, e.g. threads or processes, after the game.
+        """
+        pass
+
     def to_dict(self) -> dict:
         raise NotImplemented
     
@@ -1,5 +1,5 @@
 """
- - Move ordering implemented in _get_all_moves()
+ - Move ordering implemented in _get_all_moves() and _order_moves()
 
 - Iterative depth -> dynamic depth depending on time left
 - store 2 killer moves
@@ -11,22 +11,64 @@
 
 """
 import math
-from stupid_engine.backend.misc.stats import Statistics
+from stupid_engine.backend.misc.profiling import Profiler
+from stupid_engine.backend.misc.stats import Statistics, StatisticsWriter
 from stupid_engine.cannon.ai.move_generator import MoveGenerator
 from stupid_engine.cannon.entities.move import Move
 from stupid_engine.cannon.entities.cannon import CannonGame
-from stupid_engine.cannon.entities.player import Player
+from stupid_engine.cannon.entities.player import Player, PlayerType
+from stupid_engine.cannon.entities.bitboard import TOWN_ZONE, square
 from typing import Dict, List, Tuple
 from stupid_engine.cannon.ai.ai import BaseAI
-import pstats, cProfile
+from stupid_engine.cannon.ai.transposition import SharedTranspositionTable, TranspositionTable
+from stupid_engine.cannon.ai.time_manager import SearchTimeout, TimeManager
+from stupid_engine.cannon.ai.parallel import LazySMPSearch, RootSplitSearch
+from stupid_engine.cannon.ai.book import load_book
+from threading import Thread
 import random
-import time
-from copy import deepcopy
 import numpy as np
 
 
-# statistics for nerds:
-VERBOSE = True
+# statistics for nerds: prints the aggregated statistics after every move. The record
+# of each move is written by the stats option instead, so this is off by default
+VERBOSE = False
+
+# aspiration windows of the principal variation search: the first window is
+# the score of the previous iteration +- ASPIRATION_WINDOW, on a fail high/low
+# it is widened by ASPIRATION_GROWTH, after ASPIRATION_STEPS the full window is used
+ASPIRATION_WINDOW = 8
+ASPIRATION_GROWTH = 3
+ASPIRATION_STEPS = 3
+
+# size of the history and countermove tables, one slot for each move key
+MOVE_KEYS = 100 * 100 * 2
+
+# the history score of a quiet move is multiplied by this value before a small
+# bonus is added, so escaping soldiers and moving cannons are tried first on equal history
+QUIET_HISTORY_SCALE = 8
+
+# null move pruning: the player to move passes and the opponent is searched with a
+# reduced depth, the reduction grows at NULL_MOVE_DEEP depth. It is not used if an 
+# enemy is within range of the own town, passing could lose the game there
+# all reductions are even, the evaluation of a leaf depends on the player to move 
+# (same reason why iterative deepening increases the depth by two)
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP = 6
+
+# late move reductions: quiet moves after the first LMR_MIN_MOVES moves are searched
+# LMR_REDUCTION plies less deep and searched again if they turn out to be good
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_REDUCTION = 2
+
+# quiescence search: captures are searched at most QUIESCENCE_MAX_PLY plies deep and
+# a capture is skipped if its own value plus QUIESCENCE_DELTA does not reach alpha
+QUIESCENCE_MAX_PLY = 8
+QUIESCENCE_DELTA = 8
+
+# the depth at which pondering stops, if the opponent did not move until then
+PONDER_MAX_DEPTH = 32
 PRUNING = (0, 0, 0)
 
 def pruning_statistics(root_node: bool) -> None:
@@ -39,7 +81,10 @@ def pruning_statistics(root_node: bool) -> None:
 class AlphaBeta(BaseAI):
     def __init__(self, player: Player, cannon: CannonGame, alpha: int, beta: int, depth: int, 
                     time_limit: int, weights: List[int], use_tt: bool = True, always_sort: bool = False,
-                    quiesence: bool = True, soft_bounds: bool = True) -> None:
+                    quiesence: bool = True, soft_bounds: bool = True, pvs: bool = False, 
+                    null_move: bool = False, lmr: bool = False, tt_entries: int = None, 
+                    tt_mb: float = 16, workers: int = 1, lazy_smp: bool = False, ponder: bool = False, 
+                    book: str = None, profile: str = None, stats: str = None, qs_tt: bool = False) -> None:
         super().__init__(player, cannon)
 
         self._moves = None
@@ -56,21 +101,92 @@ class AlphaBeta(BaseAI):
         self._depth = depth
         self._extra_depth = 0
         self._delta_depth = 2
+        self._completed_depth = 0
+        self._completed_score = None
 
         self._weights = np.asarray(weights)
         self._use_tt = use_tt
         self._always_sort = always_sort
 
-        # iterative deepening, if not time limit is given, then set a max of 10 minute
-        self._time_start = 0
+        # iterative deepening, the time manager aborts the search at the time limit and
+        # decides if another iteration can be started. Without a time limit only the
+        # given depth is searched
         self._time_limit = time_limit
+        self._timer = TimeManager(time_limit)
+        self._root_best = None
 
         self._quiesence_enabled = quiesence
+        self._qs_tt = qs_tt and use_tt
         self._soft_bounds = soft_bounds
-
-        # create the transposition table container
-        self._tt = dict()
+        self._pvs = pvs
+        self._null_move = null_move
+        self._lmr = lmr
+
+        # create the transposition table container, its size is given in entries or MB
+        # the table is kept between the moves, so the next search starts warm
+        self._tt_entries = tt_entries
+        self._tt_mb = tt_mb
+        self._tt = TranspositionTable(tt_entries, tt_mb) if use_tt else None
+
+        # move ordering heuristics, updated on every beta cut off of a quiet move:
+        # two killer moves per ply, the history table (from-square x to-square) and the
+        # countermove table (the refutation of the previous move) for each player
+        self._killers = []
+        self._history = {player_type: [0] * MOVE_KEYS for player_type in [PlayerType.LIGHT, PlayerType.DARK]}
+        self._countermoves = {player_type: [None] * MOVE_KEYS for player_type in [PlayerType.LIGHT, PlayerType.DARK]}
+
+        # pondering searches the expected reply of the opponent during its turn, this
+        # runs in a thread on a copy of the game, sharing the transposition table. The
+        # thread only uses time the process would wait anyway, i.e. against a human. An
+        # engine in the same process would lose CPU time to it, see set_ponder()
+        self._ponder = ponder
+        self._ponderer = None
+        self._ponder_thread = None
+        self._ponder_key = None
+        self._ponder_result = None
+
+        # positions of the opening book are played without a search
+        self._book_file = book
+        self._book = load_book(book) if book else None
+
+        # profiling of the search is off, unless a mode is given here or in the environment
+        self._profile = profile
+        self._profiler = Profiler(profile, name=f"search-{player.get_type()}")
+
+        # the statistics of each move are appended to this file (JSON lines or CSV)
+        self._stats_file = stats
+        if stats:
+            self._stats.set_writer(StatisticsWriter(stats))
+
+        # the root moves can be split between multiple processes, or using lazy SMP all
+        # processes search the whole tree sharing one transposition table. The pool of 
+        # workers is started on the first search and kept until close() is called. The
+        # workers are configured by to_dict(), so this comes after all other settings
+        self._workers = workers
+        self._lazy_smp = lazy_smp
+        self._parallel = None
+        self._smp = None
+
+        if workers > 1 and lazy_smp:
+            if not use_tt:
+                raise ValueError("Lazy SMP needs the transposition table.")
+
+            self._tt = SharedTranspositionTable(tt_entries, tt_mb)
+            self._smp = LazySMPSearch(dict(self.to_dict(), st=None), workers, self._tt)
+        elif workers > 1:
+            self._parallel = RootSplitSearch(dict(self.to_dict(), st=None), workers)
     
+    def set_ponder(self, ponder: bool) -> None:
+        """
+        Turns pondering on or off, a running pondering search is stopped. Games between
+        two engines in one process turn it off, because of the GIL the ponder thread would
+        only take CPU time from the opponent's search.
+        """
+        if not ponder:
+            self._stop_ponder()
+
+        self._ponder = ponder
+
     def statistics_get(self, key: str = None):
         return self._stats.get(key)
 
@@ -81,16 +197,23 @@ class AlphaBeta(BaseAI):
         returned.
         """
 
-        with cProfile.Profile() as pr:
-            best_move, time_needed = self._run_search()
+        # if the opponent played the expected move, the search continues the pondering
+        resume = self._stop_ponder()
+
+        # play the move of the opening book instantly
+        book_move = self._book_move()
+        if book_move:
+            self._cannon.execute(self._player, book_move)
+            return True
+
+        with self._profiler.profile():
+            best_move, time_needed = self._run_search(resume)
 
-            # pstats.Stats(pr).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(10)
-            
         # add statistics
         if best_move:
             self._stats.add_move(best_move.get_value())
 
-        self._stats.add_ply(self._extra_depth - self._delta_depth, time_needed)
+        self._stats.add_ply(self._completed_depth, time_needed, self._search_nodes())
         self._stats.update()
 
         if VERBOSE:
@@ -110,54 +233,337 @@ class AlphaBeta(BaseAI):
         # finally execute the move and register it in the game's state
         self._cannon.execute(self._player, best_move)
 
-        # clean up the transposition table
-        self._tt = dict()
+        if self._ponder:
+            self._start_ponder()
         
         return True
     
-    def _run_search(self) -> Tuple[Move, float]:
-         # remember the start time for iterative deepening
-        self._time_start = time.time()
-        time_exceeded = False
-        time_needed = 0
+    def _run_search(self, resume: Tuple[int, int, int] = None) -> Tuple[Move, float]:
+        """
+        Runs the iterative deepening. A pondering result (move key, score, depth) of this 
+        position is used as result of the completed iterations, then the search goes on 
+        with the next depth. Without a time limit the pondering result is not used, the
+        given depth is searched.
+        """
+        # remember the start time for iterative deepening
+        self._timer.start()
 
         # set the depth, which will increased if enough time is available
-        self._extra_depth = self._depth
+        self._prepare_search(self._depth)
+        self._completed_depth = 0
+        self._completed_score = None
+        best_move = score = None
+
+        if resume and self._time_limit:
+            move_key, score, depth = resume
+            enemy = self._cannon._get_enemy_player(self._player)
+            best_move = self._moves_generator.generate_move(self._player, enemy, move_key)
+            if best_move:
+                self._completed_depth = depth
+                self._completed_score = score
+                self._extra_depth = max(self._depth, depth + self._delta_depth)
+            else:
+                score = None
+        self._root_best = None
+
+        # the helpers of lazy SMP search the same position in the background
+        if self._smp:
+            self._smp.start(self._cannon, self._player, self._extra_depth, self._timer.deadline())
+
+        try:
+            while self._timer.can_start_iteration():
+                score, move = self._search_root(score)
+                self._timer.iteration_done()
+                self._stats.add_iteration(self._extra_depth, self._search_nodes(), self._timer.elapsed())
+
+                # only the move of a completed iteration is used
+                if move:
+                    best_move = move
+                self._completed_depth = self._extra_depth
+                self._completed_score = score
+
+                # search deeper if the time has not exceeded yet
+                # increasing depth by two, to avoid the odd/even affect
+                self._extra_depth += self._delta_depth
+
+                # if the given move results in finishing the game, but the time is not over, then
+                # return this move anyway!
+                if self._found_finishing_move:
+                    break
+
+        except SearchTimeout:
+            # the search was interrupted, if not even the first iteration was completed, 
+            # then take the best move found so far even it could be not the best
+            # but this is still better than nothing
+            if not best_move:
+                best_move = self._root_best
+
+        finally:
+            if self._smp:
+                self._smp.stop()
+
+        return best_move, self._timer.elapsed()
+
+    def _principal_variation(self, best_move: Move, length: int) -> List[Move]:
+        """
+        Returns the expected line of play starting with the best move, the replies are
+        the best moves stored in the transposition table. The line ends at a finishing 
+        move, a repeated position, a position without stored move or after the given 
+        amount of moves.
+        """
+        line = [best_move]
+        if not self._use_tt:
+            return line
+
+        player, enemy = self._player, self._cannon._get_enemy_player(self._player)
+        seen = {self._cannon.hash(player.get_type())}
+        applied = 0
+        try:
+            while len(line) < length and not line[-1].is_finish_move():
+                self._cannon.apply(player, line[-1])
+                applied += 1
+                player, enemy = enemy, player
+
+                tt_hash = self._cannon.hash(player.get_type())
+                entry = self._tt.probe(tt_hash)
+                if tt_hash in seen or not entry or entry[4] is None:
+                    break
+                seen.add(tt_hash)
+
+                move = self._moves_generator.generate_move(player, enemy, entry[4])
+                if not move:
+                    break
+                line.append(move)
+        finally:
+            for _ in range(applied):
+                self._cannon.revert()
+
+        return line
+
+    def _search_nodes(self) -> int:
+        """
+        Returns the amount of nodes of the running search, including the worker processes.
+        """
+        nodes = self._timer.nodes()
+        for helper in (self._parallel, self._smp):
+            if helper:
+                nodes += helper.nodes()
+
+        return nodes
+
+    def _prepare_search(self, depth: int) -> None:
+        """
+        Resets the state of the previous search.
+        """
+        self._extra_depth = depth
+
+        # entries of previous searches are kept, but replaced first
+        if self._use_tt:
+            self._tt.new_search()
+
+        # the killers belong to the plies of the previous search, the history is aged
+        self._killers = []
+        for player_type, history in self._history.items():
+            self._history[player_type] = [h >> 1 for h in history]
+
+        if self._parallel:
+            self._parallel.new_search()
 
         self._found_finishing_move = False
-        best_move = move = None
-        while not time_exceeded:
-            # safe the best move found so far and ingore the "best move" found on the current ply
-            # this ply could be interrupted cause the time has exceeded
-            best_move = move
-            score, move = self._algorithm(self._alpha, self._beta, self._extra_depth, self._player)
-
-            # search deeper if the time has not exceeded yet
-            # increasing depth by two, to avoid the odd/even affect
-            self._extra_depth += self._delta_depth
-            time_needed = time.time() - self._time_start
-            time_exceeded = time_needed > self._time_limit if self._time_limit else True
-
-            # if the given move results in finishing the game, but the time is not over, then
-            # return this move anyway!
-            if self._found_finishing_move:
-                best_move = move
-                break
 
-        # if the best move is still none, then take the found move even it could be not the best
-        # but this is still better than nothing
-        if not best_move:
-            best_move = move
-        
-        return best_move, time_needed
+    def _search_root(self, previous_score: int) -> Tuple[int, Move]:
+        """
+        Searches the root position. Using PVS, the search starts with an aspiration window 
+        around the score of the previous iteration, which is widened if the score falls 
+        outside of it.
+        """
+        if not self._pvs or previous_score is None or abs(previous_score) == math.inf:
+            return self._search_window(self._alpha, self._beta)
+
+        delta = ASPIRATION_WINDOW
+        for _ in range(ASPIRATION_STEPS):
+            alpha = max(previous_score - delta, self._alpha)
+            beta = min(previous_score + delta, self._beta)
+
+            score, move = self._search_window(alpha, beta)
+            if alpha < score < beta:
+                return score, move
+
+            delta *= ASPIRATION_GROWTH
+
+        return self._search_window(self._alpha, self._beta)
+
+    def _search_window(self, alpha: int, beta: int) -> Tuple[int, Move]:
+        """
+        Searches the root position with the given window, either in this process or 
+        split between the workers.
+        """
+        if not self._parallel:
+            return self._algorithm(alpha, beta, self._extra_depth, self._player)
+
+        # a finishing move is played without a search
+        moves = self._get_moves(self._player)
+        if not moves or moves[0].is_finish_move():
+            return self._algorithm(alpha, beta, self._extra_depth, self._player)
+
+        # the workers have their own tables, only the best root move is stored here
+        tt_move = None
+        if self._use_tt:
+            tt_hash = self._cannon.hash(self._player.get_type())
+            entry = self._tt.probe(tt_hash)
+            tt_move = entry[4] if entry else None
+
+        self._order_moves(moves, self._player, 0, tt_move, None)
+        try:
+            score, move = self._parallel.search(self._cannon, self._player, moves, self._extra_depth,
+                                                    alpha, beta, self._timer.deadline())
+        except SearchTimeout as timeout:
+            # the root moves searched completely are still better than an unordered move
+            if timeout.best_move:
+                self._root_best = timeout.best_move
+            raise
+
+        self._root_best = move
+
+        if self._use_tt and abs(score) != math.inf:
+            bound = TranspositionTable.UPPER if score <= alpha else TranspositionTable.LOWER if score >= beta \
+                        else TranspositionTable.EXACT
+            self._tt.store(tt_hash, self._extra_depth, score, bound, move.get_key())
+
+        return score, move
+
+    def _expected_reply(self, enemy: Player) -> Move:
+        """
+        Returns the best move of the enemy stored in the transposition table, or None.
+        """
+        if not self._use_tt:
+            return None
+
+        entry = self._tt.probe(self._cannon.hash(enemy.get_type()))
+        if not entry or entry[4] is None:
+            return None
+
+        return self._moves_generator.generate_move(enemy, self._player, entry[4])
+
+    def _start_ponder(self) -> None:
+        """
+        Starts searching the position after the expected reply of the opponent in the 
+        background. The search runs on a copy of the game, until the next turn starts.
+        """
+        enemy = self._cannon._get_enemy_player(self._player)
+        reply = self._expected_reply(enemy)
+        if not reply or reply.is_finish_move():
+            return
+
+        # the ponderer is created once, it shares the transposition table
+        if self._ponderer is None:
+            light, dark = Player(PlayerType.LIGHT), Player(PlayerType.DARK)
+            player = light if self._player.get_type() == PlayerType.LIGHT else dark
+            config = dict(self.to_dict(), r=False, wk=1, po=False, st=None)
+            self._ponderer = AlphaBeta.from_dict(config, player, CannonGame(light, dark))
+            self._ponderer._use_tt = True
+            self._ponderer._tt = self._tt
+            self._ponderer._qs_tt = self._qs_tt
+
+        ponderer = self._ponderer
+        game = ponderer._cannon
+        game.set_position(self._cannon.get_position())
+        game.apply(game._get_enemy_player(ponderer._player), reply)
+
+        self._ponder_key = game.hash(self._player.get_type())
+        self._ponder_result = None
+
+        # the timer is created here, so stop() always reaches the running search
+        ponderer._timer = TimeManager(None)
+        self._ponder_thread = Thread(target=self._run_ponder, name="PonderThread", daemon=True)
+        self._ponder_thread.start()
+
+    def _run_ponder(self) -> None:
+        """
+        The iterative deepening of the ponderer, it runs until it is stopped. The result
+        of the last completed iteration is kept as (move key, score, depth).
+        """
+        ponderer = self._ponderer
+        ponderer._timer.start()
+        ponderer._prepare_search(ponderer._depth)
+
+        score = None
+        try:
+            while ponderer._extra_depth <= PONDER_MAX_DEPTH:
+                score, move = ponderer._search_root(score)
+                if move:
+                    self._ponder_result = (move.get_key(), score, ponderer._extra_depth)
+
+                if ponderer._found_finishing_move:
+                    break
+
+                ponderer._extra_depth += ponderer._delta_depth
+
+        except SearchTimeout:
+            pass
+
+    def _stop_ponder(self) -> Tuple[int, int, int]:
+        """
+        Stops the pondering and returns its result, if the opponent played the expected 
+        move (ponder hit). Otherwise None is returned and a fresh search is needed.
+        """
+        if self._ponder_thread is None:
+            return None
+
+        self._ponderer._timer.stop()
+        self._ponder_thread.join()
+        self._ponder_thread = None
+
+        if self._cannon.hash(self._player.get_type()) != self._ponder_key:
+            return None
+
+        return self._ponder_result
+
+    def close(self) -> None:
+        """
+        Stops pondering and the worker processes of the parallel search.
+        """
+        self._stop_ponder()
+
+        if self._parallel:
+            self._parallel.close()
+
+        if self._smp:
+            self._smp.close()
+            self._tt.close()
+
+        if self._stats.get_writer():
+            self._stats.get_writer().close()
 
     def set_town_position(self, positions: List[Move]) -> Move:
         """
-        This method places a position for the town randomly
+        This method places the town at the position of the opening book, if there is
+        no entry the town is placed randomly.
         """
+        if self._book:
+            town = self._book.lookup(self._cannon.hash(self._player.get_type()))
+            for position in positions:
+                if town is not None and square(position.get_pos()) == town:
+                    return position
+
         position = random.choice(positions)
         return position
 
+    def _book_move(self) -> Move:
+        """
+        Returns the move of the opening book for the current position, or None.
+        """
+        if not self._book:
+            return None
+
+        move_key = self._book.lookup(self._cannon.hash(self._player.get_type()))
+        if move_key is None:
+            return None
+
+        # the stored move is only played, if it is possible on this board
+        enemy = self._cannon._get_enemy_player(self._player)
+        return self._moves_generator.generate_move(self._player, enemy, move_key)
+
     def _get_moves(self, player) -> List[Move]: 
         """
         Generates all moves for each soldier of the current player given as an argument.
@@ -174,8 +580,8 @@ class AlphaBeta(BaseAI):
         """
         moves = self._moves_generator.generate_moves(player, self._cannon._get_enemy_player(player))
 
-        for m in moves:
-            score = self._eval(player, m)
+        # all moves are evaluated in one go
+        for m, score in zip(moves, self._cannon.eval_batch(player, moves, self._weights)):
             m.set_value(score)
 
         self._sort_moves(moves)
@@ -188,74 +594,211 @@ class AlphaBeta(BaseAI):
         """
         moves.sort(key=lambda m: m._value, reverse=True)
     
+    def _order_moves(self, moves: List[Move], player: Player, ply: int, tt_move: int, previous: int) -> None:
+        """
+        Orders the moves in place: the move of the transposition table, kills and 
+        finishing moves, the killer moves of this ply, the countermove of the previous 
+        move and then all other moves by their history score. The sort is stable, so 
+        moves sorted by their value keep this order within a group.
+        """
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        counter = self._countermoves[player.get_type()][previous] if previous is not None else None
+        history = self._history[player.get_type()]
+
+        def order(move: Move) -> Tuple[int, int]:
+            # the move key is only compared, so a collision can not select an illegal move
+            key = move.get_key()
+            if key == tt_move:
+                return 0, 0
+            if move.is_kill_move() or move.is_finish_move():
+                return 1, 0
+            if key == killers[0]:
+                return 2, 0
+            if key == killers[1]:
+                return 3, 0
+            if key == counter:
+                return 4, 0
+            return 5, -history[key]
+
+        moves.sort(key=order)
+
+    def _pick_moves(self, player: Player, ply: int, tt_move: int, previous: int):
+        """
+        Yields the moves of a node stage by stage: the move of the transposition table, 
+        finishing moves, shots and captures, the killer moves and the countermove and at 
+        last the quiet moves sorted by a cheap integer key. A stage is only generated if 
+        the moves of the previous stages did not cause a cut off.
+        """
+        enemy = self._cannon._get_enemy_player(player)
+        generator = self._moves_generator
+        done = []
+
+        # the stored keys are only used if the move is possible on this board
+        if tt_move is not None:
+            move = generator.generate_move(player, enemy, tt_move)
+            if move:
+                done.append(tt_move)
+                yield move
+
+        # if the game can be finished, then only this move is generated
+        captures = generator.generate_moves(player, enemy, mode=MoveGenerator.CAPTURES)
+        for move in captures:
+            if move.get_key() not in done:
+                yield move
+
+        if len(captures) == 1 and captures[0].is_finish_move():
+            return
+
+        killers = self._killers[ply] if ply < len(self._killers) else []
+        counter = self._countermoves[player.get_type()][previous] if previous is not None else None
+        for key in killers + [counter]:
+            if key is None or key in done:
+                continue
+
+            move = generator.generate_move(player, enemy, key)
+            if move and not move.is_kill_move() and not move.is_finish_move():
+                done.append(key)
+                yield move
+
+        history = self._history[player.get_type()]
+        quiets = generator.generate_moves(player, enemy, mode=MoveGenerator.QUIETS)
+        quiets.sort(key=lambda m: history[m.get_key()] * QUIET_HISTORY_SCALE + 
+                        m.is_retreat_move() * 4 + m.is_sliding_move() * 2, reverse=True)
+
+        for move in quiets:
+            if move.get_key() not in done:
+                yield move
+
+    def _update_heuristics(self, move: Move, player: Player, ply: int, depth: int, previous: int) -> None:
+        """
+        Registers a quiet move that caused a beta cut off as killer, in the history 
+        table and as countermove of the previous move.
+        """
+        if move.is_kill_move() or move.is_finish_move():
+            return
+
+        key = move.get_key()
+        while len(self._killers) <= ply:
+            self._killers.append([None, None])
+
+        killers = self._killers[ply]
+        if killers[0] != key:
+            killers[1] = killers[0]
+            killers[0] = key
+
+        self._history[player.get_type()][key] += depth * depth
+        if previous is not None:
+            self._countermoves[player.get_type()][previous] = key
+
     def _eval(self, player: Player, move: Move) -> int:
         return self._cannon.eval(player, move, self._weights)
 
-    def _algorithm(self, alpha: int, beta: int, depth: int, player: Player) -> Tuple[int, Move]:
+    def _algorithm(self, alpha: int, beta: int, depth: int, player: Player, previous: int = None, 
+                    allow_null: bool = True, ply: int = 0) -> Tuple[int, Move]:
         """
         The algorithm calcualtes the best move using the Alpha Beta algorithm combined with Iterative Deepening
-        and a Transposition Table.
+        and a Transposition Table. The key of the move leading to this position is given as previous. The
+        ply is the distance from the root, with reductions the depth does not tell it anymore.
         """
-        time_exceeded = time.time() - self._time_start > self._time_limit if self._time_limit else False
-        # if time_exceeded:
-        #     return math.inf, None
+        # the time manager raises a SearchTimeout if the time is over
+        self._timer.node()
 
         # if the maximum depth is reached, then return the best move
-        # also, get the current time to check if the search should end
-        if(depth == 0 or time_exceeded):
+        if depth <= 0:
             if self._quiesence_enabled:
                 score = self._quiesence(alpha, beta, player)
             else:
-                score = self._get_moves_sorted(player)[0].get_value()
+                # only the best value is needed, so the moves are not sorted. Without any
+                # move the player has lost, like in the quiescence search
+                moves = self._moves_generator.generate_moves(player, self._cannon._get_enemy_player(player))
+                score = max(self._cannon.eval_batch(player, moves, self._weights)) if moves else -math.inf
             return score, None
 
-        # create a best score for a fail soft
-        best_score = -math.inf if self._soft_bounds else alpha
-        moves = None
+        root = depth == self._extra_depth
+        alpha_orig = alpha
 
-        # check if there is already a best move known, before running the search
+        # check if this position was searched before, if it was searched deep enough the 
+        # stored score can be used directly or narrows the window. Otherwise the stored
+        # best move is at least searched first
         # this optimization uses the "transposition table" and the "zobrist hashing"
-        best_move = None
+        tt_move = None
         if self._use_tt:
             tt_hash = self._cannon.hash(player.get_type())
-            best_move = self._tt.get(tt_hash, None)
+            entry = self._tt.probe(tt_hash)
+
+            if entry:
+                _, tt_depth, tt_score, tt_bound, tt_move, _ = entry
+                self._stats.add_move_loaded(tt_score)
+
+                # the root has to search to get the best move
+                if tt_depth >= depth and not root:
+                    if tt_bound == TranspositionTable.EXACT:
+                        return tt_score, None
+                    elif tt_bound == TranspositionTable.LOWER:
+                        alpha = max(alpha, tt_score)
+                    elif tt_bound == TranspositionTable.UPPER:
+                        beta = min(beta, tt_score)
+
+                    if alpha >= beta:
+                        return tt_score, None
+
+        enemy = self._cannon._get_enemy_player(player)
+
+        # null move pruning: if the position is still good enough after passing, then
+        # a real move will be even better. The opponent is not allowed to pass as well
+        if self._null_move and allow_null and not root and depth >= NULL_MOVE_MIN_DEPTH and beta != math.inf \
+                and not enemy.get_board() & TOWN_ZONE[player.get_town_square()]:
+            reduction = NULL_MOVE_REDUCTION + 2 * (depth >= NULL_MOVE_DEEP)
+            score, _ = self._algorithm(-1 * beta, -1 * beta + 1, depth - 1 - reduction, enemy, None, False, ply + 1)
+            score *= -1
 
-        if best_move:
-            # loading the best move known and set it to the beginning of the list of
-            # avialable moves
-            self._stats.add_move_loaded(best_move.get_value())
-            moves = [best_move] + self._get_moves(player)
-        else:
+            if score >= beta:
+                self._stats.add_pruning(root)
+                return score, None
+
+        # create a best score for a fail soft
+        best_score = -math.inf if self._soft_bounds else alpha
+        best_move = None
+
+        # the best move known is set to the beginning of the list of avialable moves
+        # all root moves are generated and ordered once, the other nodes pick their
+        # moves stage by stage, because most of them cut off after the first moves
+        if root:
             moves = self._get_moves(player)
+            self._order_moves(moves, player, ply, tt_move, previous)
+        else:
+            moves = self._pick_moves(player, ply, tt_move, previous)
 
+        searched = 0
         for move in moves:
             # if there is a fnishing move, do a hard break
             # and force the AI to play into this direction
             if move.is_finish_move() and player.get_type() == self._player.get_type():
-                best_score = move.get_value() # move.get_score
-                if not best_score:
-                    score = self._eval(player, move)
-                    move.set_value(score)
-                    best_score = score
+                # picked moves are not evaluated yet
+                best_score = self._eval(player, move)
+                move.set_value(best_score)
 
                 best_move = move
-                self._found_finishing_move = True
+                self._found_finishing_move = root
                 break
 
-            self._cannon.execute(player, move, testing_only=True)
-            enemy = self._cannon._get_enemy_player(player)
-            # do the recursion step
-            score, _ = self._algorithm(-1 * beta, -1 * alpha, depth - 1, enemy)
-            score *= -1
-
-            # undo the recursion step
-            self._cannon.undo(player, move)
+            # the move is undone even if the search is aborted
+            self._cannon.apply(player, move)
+            try:
+                score = self._search_move(move, alpha, beta, depth, enemy, root, searched, ply)
+            finally:
+                self._cannon.revert()
+            searched += 1
 
             if score >= beta:
                 # fail soft -> beta cut off
                 # this is the pruning part
-                self._stats.add_pruning(depth == self._extra_depth)
-                return score, move
+                self._stats.add_pruning(root)
+                self._stats.add_cutoff(searched == 1)
+                self._update_heuristics(move, player, ply, depth, previous)
+                best_score = score
+                best_move = move
+                break
 
             if self._soft_bounds:
                 if score > best_score:
@@ -269,54 +812,150 @@ class AlphaBeta(BaseAI):
                 if score > alpha:
                     alpha = best_score = score
                     best_move = move
+
+            # remember the best root move, in case the iteration gets interrupted
+            if root:
+                self._root_best = best_move
         
-        if self._use_tt and best_move:
-            stored = self._tt.get(best_move, None)
-            if stored is not None:
-                raise ValueError("Multiple hashes are not valid!")
+        # store the result together with the type of its bound, a score below the
+        # original window is an upper bound, a score above is a lower bound
+        if self._use_tt and abs(best_score) != math.inf:
+            if best_score <= alpha_orig:
+                bound = TranspositionTable.UPPER
+            elif best_score >= beta:
+                bound = TranspositionTable.LOWER
+            else:
+                bound = TranspositionTable.EXACT
 
-            self._stats.add_move_stored(best_move.get_value())
-            self._tt[tt_hash] = deepcopy(best_move)
+            if self._tt.store(tt_hash, depth, best_score, bound, best_move.get_key() if best_move else None):
+                self._stats.add_move_stored(best_score)
 
         return best_score, best_move
     
-    def _quiesence(self, alpha: int, beta: int, player: Player) -> int:
+    def _search_move(self, move: Move, alpha: int, beta: int, depth: int, enemy: Player, root: bool, searched: int,
+                        ply: int) -> int:
         """
-        A variable depth search approach, that searches for a quiete move and then evaluates.
+        Searches the position after the given move, which was already executed. Returns 
+        the score from the perspective of the player who made the move.
         """
-        moves = self._get_moves(player)
-        for move in moves:
-            # if the move is a finishing one, then defenitly use this one!
-            if move.is_finish_move():
-                self._found_finishing_move = player.get_type() == self._player.get_type()
-                # score = -100_000 if player.get_type() != self._player.get_type() else 100_000
-                # factor = -1 if player.get_type() != self._player.get_type() else 1
-                return move.get_value() # * factor
-            
-            # if the move is quiet, the evaluate it
-            if not move.is_kill_move():
-                # get the scores value, or evaluate it
-                score = move.get_value()
-                if not score:
-                    score = self._eval(player, move)
-                    move.set_value(score)
-                
-                # score = -score if player.get_type() != self._player.get_type() else score
-                # factor = -1 if player.get_type() != self._player.get_type() else 1
-                return score # * factor
-
-            # search deeper if the move was not quiete
-            self._cannon.execute(player, move, testing_only=True)
-            enemy = self._cannon._get_enemy_player(player)
-            score = -self._quiesence(-alpha, -beta, enemy)
-            self._cannon.undo(player, move)
-                        
+        # the position after the move is one ply further from the root
+        child = ply + 1
+
+        # late move reduction: a quiet move late in the ordered list is expected to 
+        # fail low, so this is verified with a reduced null window search first
+        reduced = False
+        if self._lmr and not root and searched >= LMR_MIN_MOVES and depth >= LMR_MIN_DEPTH \
+                and alpha != -math.inf and not move.is_kill_move() and not move.is_finish_move():
+            score, _ = self._algorithm(-1 * alpha - 1, -1 * alpha, depth - 1 - LMR_REDUCTION, enemy, move.get_key(),
+                                        ply=child)
+            score *= -1
+            reduced = score <= alpha
+
+        # do the recursion step, using PVS only the first move is searched with
+        # the full window, the others have to prove they fail low using a null window
+        if not reduced:
+            if self._pvs and searched > 0 and alpha != -math.inf:
+                score, _ = self._algorithm(-1 * alpha - 1, -1 * alpha, depth - 1, enemy, move.get_key(), ply=child)
+                score *= -1
+
+                # the move is better than expected, search it again with the full window
+                if alpha < score < beta:
+                    score, _ = self._algorithm(-1 * beta, -1 * alpha, depth - 1, enemy, move.get_key(), ply=child)
+                    score *= -1
+            else:
+                score, _ = self._algorithm(-1 * beta, -1 * alpha, depth - 1, enemy, move.get_key(), ply=child)
+                score *= -1
+
+        return score
+
+    def _quiesence(self, alpha: int, beta: int, player: Player, ply: int = 0) -> int:
+        """
+        Searches the shots, captures and finishing moves of a leaf until the position is
+        quiet. The player can always decline to capture, this value (stand pat) is a lower 
+        bound of the score, so a capture is only searched if it can raise the score. At 
+        the leaf itself the stand pat is the best quiet move, deeper only the captures are
+        generated and the stand pat is the static evaluation of the position. Captures 
+        whose own value is far below alpha are skipped (delta pruning).
+        """
+        self._timer.node()
+
+        # the results of earlier searches of this position can be used, the stored depth
+        # is always deep enough
+        entry = tt_hash = None
+        if self._qs_tt:
+            tt_hash = self._cannon.hash(player.get_type())
+            entry = self._tt.probe(tt_hash)
+
+            if entry:
+                _, _, tt_score, tt_bound, _, _ = entry
+                self._stats.add_move_loaded(tt_score)
+                if tt_bound == TranspositionTable.EXACT or \
+                        (tt_bound == TranspositionTable.LOWER and tt_score >= beta) or \
+                        (tt_bound == TranspositionTable.UPPER and tt_score <= alpha):
+                    return tt_score
+
+        enemy = self._cannon._get_enemy_player(player)
+        generator = self._moves_generator
+
+        # if the game can be finished, then only this move is generated
+        moves = generator.generate_moves(player, enemy, mode=MoveGenerator.ALL if ply == 0 else MoveGenerator.CAPTURES)
+        if moves and moves[0].is_finish_move():
+            return self._eval(player, moves[0])
+
+        # at the leaf all moves are evaluated at once, the best quiet move is the stand 
+        # pat, so the leaf scores like in the search without quiescence. Deeper a player 
+        # without soldiers has lost, otherwise the position is evaluated
+        best_score = -math.inf
+        if ply > 0 and player.get_board():
+            best_score = self._cannon.eval_position(player, self._weights)
+
+        captures = []
+        for value, move in zip(self._cannon.eval_batch(player, moves, self._weights), moves):
+            if move.is_kill_move():
+                captures.append((value, move))
+            elif value > best_score:
+                best_score = value
+
+        if best_score >= beta or not captures or ply >= QUIESCENCE_MAX_PLY:
+            return best_score
+
+        alpha_orig = alpha
+        alpha = max(alpha, best_score)
+
+        # the captures are searched by their value, so the delta pruning can stop at
+        # the first capture below the margin
+        captures.sort(key=lambda item: item[0], reverse=True)
+        for value, move in captures:
+            if value + QUIESCENCE_DELTA <= alpha:
+                break
+
+            self._cannon.apply(player, move)
+            try:
+                score = -self._quiesence(-beta, -alpha, enemy, ply + 1)
+            finally:
+                self._cannon.revert()
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+
             if score >= beta:
-                return beta
-            if alpha < score:
-                alpha = score
-        
-        return alpha
+                break
+
+        # results of the normal search are deeper, those are not replaced
+        if self._qs_tt and abs(best_score) != math.inf and (not entry or entry[1] == 0):
+            if best_score <= alpha_orig:
+                bound = TranspositionTable.UPPER
+            elif best_score >= beta:
+                bound = TranspositionTable.LOWER
+            else:
+                bound = TranspositionTable.EXACT
+
+            if self._tt.store(tt_hash, 0, best_score, bound):
+                self._stats.add_move_stored(best_score)
+
+        return best_score
     
     def to_dict(self) -> dict:
         d = dict()
@@ -329,7 +968,28 @@ class AlphaBeta(BaseAI):
         d["w"] = self._weights
         d["r"] = self._use_tt
         d["s"] = self._always_sort
+        d["q"] = self._quiesence_enabled
+        d["sb"] = self._soft_bounds
+        d["pv"] = self._pvs
+        d["nm"] = self._null_move
+        d["lmr"] = self._lmr
+        d["tte"] = self._tt_entries
+        d["ttm"] = self._tt_mb
+        d["wk"] = self._workers
+        d["smp"] = self._lazy_smp
+        d["po"] = self._ponder
+        d["bk"] = self._book_file
+        d["pf"] = self._profile
+        d["st"] = self._stats_file
+        d["qtt"] = self._qs_tt
         return d
     
     def from_dict(d: dict, player: Player, cannon: CannonGame):
-        return AlphaBeta(player, cannon, d["a"], d["b"], d["d"], d["t"], d["w"], d["r"], d["s"])
\ No newline at end of file
+        # older savegames do not contain the newer settings, so use the defaults then
+        return AlphaBeta(player, cannon, d["a"], d["b"], d["d"], d["t"], d["w"], d["r"], d["s"], 
+                            quiesence=d.get("q", True), soft_bounds=d.get("sb", True), pvs=d.get("pv", False),
+                            null_move=d.get("nm", False), lmr=d.get("lmr", False),
+                            tt_entries=d.get("tte", None), tt_mb=d.get("ttm", 16), workers=d.get("wk", 1), 
+                            lazy_smp=d.get("smp", False), ponder=d.get("po", False),
+                            book=d.get("bk", None), profile=d.get("pf", None),
+                            stats=d.get("st", None), qs_tt=d.get("qtt", False))
\ No newline at end of file
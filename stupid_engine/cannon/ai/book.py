@@ -0,0 +1,168 @@
+"""
+Opening book of the AlphaBeta AI, built from games of the AI against itself.
+
+Usage: python -m stupid_engine.cannon.ai.book <file> [--games N] [--plies N] [--depth N] [--time T] [--workers N]
+"""
+import argparse
+import struct
+from stupid_engine.cannon.entities.cannon import CannonGame
+from stupid_engine.cannon.entities.figures import CannonTown
+from stupid_engine.cannon.entities.player import Player, PlayerType
+from stupid_engine.cannon.entities.bitboard import POS
+from typing import Dict, Tuple
+
+
+# file format: the header (magic, amount of entries) followed by the entries
+# (zobrist key, move key, visits, score) sorted by the key
+BOOK_MAGIC = b"CBK1"
+BOOK_HEADER = struct.Struct("<4sI")
+BOOK_ENTRY = struct.Struct("<QHIi")
+
+# a move is only played from the book, if it was played at least this often
+BOOK_MIN_VISITS = 2
+
+# the first moves of each game added to the book
+BOOK_PLIES = 8
+
+# the books are loaded once per process and file
+_loaded = dict()
+
+
+class OpeningBook:
+    def __init__(self) -> None:
+        """
+        The book maps the zobrist key of a position to the moves played in it. For every
+        move the visits and the score are counted, the score is the sum of the results of
+        the games from the view of the moving player: +1 for a win, -1 for a loss and 0 for
+        a draw. The placement of a town is stored like a move, its key is the square of the
+        town.
+        """
+        self._positions = dict()
+
+    def add(self, key: int, move_key: int, result: int) -> None:
+        """
+        Counts the move in the position of the given key with the result of the game.
+        """
+        moves = self._positions.setdefault(key, dict())
+        visits, score = moves.get(move_key, (0, 0))
+        moves[move_key] = (visits + 1, score + result)
+
+    def get_moves(self, key: int) -> Dict[int, Tuple[int, int]]:
+        """
+        Returns the moves of the position as dictionary move key -> (visits, score).
+        """
+        return self._positions.get(key, dict())
+
+    def lookup(self, key: int, min_visits: int = BOOK_MIN_VISITS) -> int:
+        """
+        Returns the key of the move with the best average score or None, if the position
+        is not in the book. On equal scores the move played more often is used.
+        """
+        best = None
+        best_order = None
+        for move_key, (visits, score) in self.get_moves(key).items():
+            if visits < min_visits:
+                continue
+
+            order = (score / visits, visits, -move_key)
+            if best_order is None or order > best_order:
+                best, best_order = move_key, order
+
+        return best
+
+    def save(self, path: str) -> None:
+        entries = [(key, move_key, visits, score) for key, moves in self._positions.items()
+                    for move_key, (visits, score) in moves.items()]
+        entries.sort()
+
+        with open(path, "wb") as f:
+            f.write(BOOK_HEADER.pack(BOOK_MAGIC, len(entries)))
+            for entry in entries:
+                f.write(BOOK_ENTRY.pack(*entry))
+
+    def load(path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, amount = BOOK_HEADER.unpack_from(data)
+        if magic != BOOK_MAGIC or len(data) != BOOK_HEADER.size + amount * BOOK_ENTRY.size:
+            raise ValueError(f"The file {path} is not an opening book.")
+
+        book = OpeningBook()
+        for key, move_key, visits, score in BOOK_ENTRY.iter_unpack(data[BOOK_HEADER.size:]):
+            book._positions.setdefault(key, dict())[move_key] = (visits, score)
+
+        return book
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+def load_book(path: str) -> OpeningBook:
+    """
+    Returns the book of the given file, every file is only read once.
+    """
+    if path not in _loaded:
+        _loaded[path] = OpeningBook.load(path)
+
+    return _loaded[path]
+
+
+def build_book(light: Dict, dark: Dict, games: int, plies: int = BOOK_PLIES, workers: int = None,
+                    book: OpeningBook = None) -> OpeningBook:
+    """
+    Plays the given amount of games between the two AI configurations and adds the town
+    placements and the first moves of every game to the book. The games differ by the
+    random placement of the towns.
+    """
+    # imported here, the headless games import the AlphaBeta AI which uses this module
+    from stupid_engine.cannon.headless import MAX_PLIES, play_games
+
+    if book is None:
+        book = OpeningBook()
+
+    jobs = [(light, dark, seed, MAX_PLIES) for seed in range(games)]
+    for record in play_games(jobs, workers):
+        winner = record["w"]
+
+        # the result of a move from the view of the moving player, dark moves first
+        def result(ply: int) -> int:
+            if winner is None:
+                return 0
+            mover = PlayerType.DARK if ply % 2 == 0 else PlayerType.LIGHT
+            return 1 if mover == winner else -1
+
+        # replay the town placement to get the keys of the positions
+        p_light, p_dark = Player(PlayerType.LIGHT), Player(PlayerType.DARK)
+        cannon = CannonGame(p_light, p_dark)
+        for ply, (player, town) in enumerate(zip((p_dark, p_light), record["t"])):
+            book.add(cannon.hash(player.get_type()), town, result(ply))
+            player._set_town(CannonTown(init_pos=POS[town]))
+
+        for ply, (key, move_key) in enumerate(record["m"][:plies]):
+            book.add(key, move_key, result(ply))
+
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds an opening book from games of the AI against itself.")
+    parser.add_argument("file", help="the book is written to this file, an existing book is extended")
+    parser.add_argument("--games", type=int, default=64)
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--time", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    from stupid_engine.cannon.headless import engine_config
+    config = engine_config(depth=args.depth, time_limit=args.time, pvs=True, null_move=True, lmr=True)
+
+    try:
+        book = OpeningBook.load(args.file)
+    except FileNotFoundError:
+        book = None
+
+    book = build_book(config, config, args.games, args.plies, args.workers, book)
+    book.save(args.file)
+    print(f"The book contains {len(book)} positions.")
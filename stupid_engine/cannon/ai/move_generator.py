@@ -1,88 +1,199 @@
 from stupid_engine.cannon.entities.move import Move
 from stupid_engine.cannon.entities.player import PlayerType
+from stupid_engine.cannon.entities.bitboard import BIT, POS, SQUARES, on_board, square, squares
 from typing import List
 
 
+# directions of the cannons, for every direction the cannon consists of the given
+# soldier and the two soldiers behind it. The order is the order in which the moves
+# are generated: vertical, the two diagonals and horizontal
+CANNON_DIRECTIONS = [(0, 1), (0, -1), (1, 1), (-1, -1), (1, -1), (-1, 1), (1, 0), (-1, 0)]
+
+
+def _sq(x: int, y: int) -> int:
+    return y * 10 + x if on_board(x, y) else -1
+
+
+def _build_tables():
+    """
+    Creates the lookup tables for every square and playing direction. Squares
+    outside of the board are already removed, so the generator does not need to
+    check any bounds.
+    """
+    forward = {-1: [], 1: []}
+    retreat = {-1: [], 1: []}
+    threat = {-1: [], 1: []}
+    capture = []
+    cannons = []
+
+    for sq in range(SQUARES):
+        x, y = POS[sq]
+
+        # front, front_left, front_right
+        for d in (-1, 1):
+            forward[d].append([s for s in (_sq(x, y + d), _sq(x - 1, y + d), _sq(x + 1, y + d)) if s >= 0])
+
+            # retreat moves are 2 places behind the soldier and two places left/right of
+            # that position, the square in between has to be free
+            retreat[d].append([(_sq(mx, my), _sq(fx, fy)) for (mx, my), (fx, fy) in [
+                ((x - 2, y - 2 * d), (x - 1, y - d)),
+                ((x, y - 2 * d), (x, y - d)),
+                ((x + 2, y - 2 * d), (x + 1, y - d))] if on_board(mx, my)])
+
+            # a soldier is threatened by every enemy next to it, except the one directly behind
+            mask = 0
+            for tx, ty in [(x - 1, y + d), (x, y + d), (x + 1, y + d), (x - 1, y), (x + 1, y), (x - 1, y - d), (x + 1, y - d), (x, y - d)]:
+                if on_board(tx, ty):
+                    mask |= BIT[_sq(tx, ty)]
+            threat[d].append(mask)
+
+        # the sideway captures: left, right
+        capture.append([s for s in (_sq(x - 1, y), _sq(x + 1, y)) if s >= 0])
+
+        # structure of the cannon entries:
+        # (mask of soldiers needed for cannon, possible positions for shoots,
+        #   free position for shoot, slide position)
+        cases = []
+        for dx, dy in CANNON_DIRECTIONS:
+            structure = [_sq(x - dx, y - dy), _sq(x - 2 * dx, y - 2 * dy)]
+            if -1 in structure:
+                continue
+
+            # a shot can not pass the border of the board
+            shots = []
+            for s in (_sq(x + 2 * dx, y + 2 * dy), _sq(x + 3 * dx, y + 3 * dy)):
+                if s < 0:
+                    break
+                shots.append(s)
+
+            free = _sq(x + dx, y + dy)
+            slide = _sq(x - 3 * dx, y - 3 * dy)
+            cases.append((BIT[structure[0]] | BIT[structure[1]], shots, free, slide))
+        cannons.append(cases)
+
+    return forward, capture, cannons, retreat, threat
+
+
+# the tables are indexed by the playing direction (if needed) and the square of the soldier
+FORWARD, CAPTURE, CANNONS, RETREAT, THREAT = _build_tables()
+
+
 class MoveGenerator:
+
+    # the kind of moves to generate: all moves, only finishing moves, kills and shots
+    # or only the remaining quiet moves
+    ALL = 0
+    CAPTURES = 1
+    QUIETS = 2
+
     def __init__(self) -> None:
         self._moves = []
 
-    def generate_moves(self, player, enemy, soldier=None) -> List[Move]:
+    def generate_moves(self, player, enemy, soldier=None, mode: int = ALL) -> List[Move]:
         """
-        This method generates all moves for the given player and for all soldiers 
-        obtained by the player. If a soldier was explicitly given, then only the 
-        moves for this player are generated. This is useful, if a human clicked 
+        This method generates all moves for the given player and for all soldiers
+        obtained by the player. If a soldier was explicitly given, then only the
+        moves for this player are generated. This is useful, if a human clicked
         on one solider and wants the move of this piece shown on screen.
         """
         self.refresh()
 
         # if a soldier was given, only return its moves
         if soldier:
-            self._generate_moves(player, enemy, soldier, False)
+            self._generate_moves(player, enemy, square(soldier.get_pos()), False)
             return self._moves
 
         # if no soldier was given, then generate all moves available
-        for soldier in player.get_soldiers().values():
-            self._generate_moves(player, enemy, soldier)
+        for sq in squares(player.get_board()):
+            self._generate_moves(player, enemy, sq, mode=mode)
 
             # force a end move
             if len(self._moves) == 1 and self._moves[0].is_finish_move():
                 return self._moves
-        
+
         return self._moves
-       
-    def _generate_moves(self, player, enemy, soldier, ai=True) -> Move:
+
+    def generate_move(self, player, enemy, key: int) -> Move:
+        """
+        This method returns the move of the given key if it is possible on the current
+        board, otherwise None. Only the moves of the soldier at the origin of the key are
+        generated, so this is a cheap way to check stored moves like killer moves.
+        """
+        soldier = key // 200
+        if not player.get_board() & BIT[soldier]:
+            return None
+
+        self.refresh()
+        self._generate_moves(player, enemy, soldier, False)
+        for move in self._moves:
+            if move.get_key() == key:
+                return move
+
+        return None
+
+    def _generate_moves(self, player, enemy, soldier, ai=True, mode: int = ALL) -> Move:
         # determine the direction in which the current player is playing
         d = -1 if player.get_type() == PlayerType.LIGHT else +1
-        x, y = soldier.get_pos()
-        
+
+        # the moves are created from their packed code, the code of a move is the code 
+        # of its origin plus 32 times the destination plus its flags
+        new = Move.from_code
+        origin = Move.encode(soldier, 0, 0)
+
+        # occupation of the board, a square is tested by and-ing its bit
+        own = player.get_board()
+        other = enemy.get_board()
+        occupied = own | other
+        own_town = player.get_town_square()
+        enemy_town = enemy.get_town_square()
+        moves = self._moves
+        captures = mode != MoveGenerator.QUIETS
+        quiets = mode != MoveGenerator.CAPTURES
+
         #
         #   STANDARD MOVES
         #
 
         # create the basic movement moves: front_left, front, front_right
-        # this includes checking if a enemy soldier or the enemy town is placed 
+        # this includes checking if a enemy soldier or the enemy town is placed
         # in this position. This move is then marked as kill / finishing move.
-        for move in [(x, y + d), (x - 1, y + d), (x + 1, y + d)]:
-            if Move.out_of_bounds(move) or player.soldier_at(move):
+        for move in FORWARD[d][soldier]:
+            if own & BIT[move]:
+                continue
+
+            if not captures:
+                if not other & BIT[move] and move != enemy_town:
+                    moves.append(new(origin + move * 32))
                 continue
 
             # other moves are not interesting if the player can finish the game
-            town = enemy.get_town().get_pos() == move
-            if town:
-                town_move = Move(pos=move, soldier=soldier.get_pos(), finish=town)
+            if move == enemy_town:
+                town_move = new(origin + move * 32 + Move.FINISH)
                 if ai:
                     self._moves = [town_move]
                     return
                 else:
-                    self._moves.append(town_move)
+                    moves.append(town_move)
 
+            if other & BIT[move]:
+                moves.insert(0, new(origin + move * 32 + Move.KILL))
 
+            elif quiets:
+                moves.append(new(origin + move * 32))
 
-            kill = enemy.soldier_at(move)
-            if kill:
-                kill = kill.get_pos()
-                self._moves.insert(0, Move(pos=move, soldier=soldier.get_pos(), kill=kill))
-
-            else:
-                self._moves.append(Move(pos=move, soldier=soldier.get_pos()))
-        
         # create the capture / kill moves
-        for move in [(x - 1, y), (x + 1, y)]:
+        for move in CAPTURE[soldier] if captures else ():
             # other moves are not interesting if the player can finish the game
-            town = enemy.get_town().get_pos() == move
-            if town:
-                town_move = Move(pos=move, soldier=soldier.get_pos(), finish=town)
+            if move == enemy_town:
+                town_move = new(origin + move * 32 + Move.FINISH)
                 if ai:
                     self._moves = [town_move]
                     return
                 else:
-                    self._moves.append(town_move)
+                    moves.append(town_move)
 
-            kill = enemy.soldier_at(move)
-            if kill:
-                kill = kill.get_pos()
-                self._moves.insert(0, Move(pos=move, soldier=soldier.get_pos(), kill=kill))
+            if other & BIT[move]:
+                moves.insert(0, new(origin + move * 32 + Move.KILL))
 
         #
         #   CANNON MOVES
@@ -90,73 +201,43 @@ class MoveGenerator:
 
         # recognize a cannon and find possible moves for it
         # check for 3 adjacent soldiers
-        # structure of the lists: 
-        # [soldiers needed for cannon; possible positions for shoots; 
-        #   free position for shoot; slide position]
-        cannon_cases = [
-            # orthogonal row, given soldier front
-            [[(x, y - 1), (x, y - 2)], [(x, y + 2), (x, y + 3)], (x, y + 1), (x, y - 3)],
-            # 3 in a orthogonal row, given soldier back
-            [[(x, y + 1), (x, y + 2)], [(x, y - 2), (x, y - 3)], (x, y - 1), (x, y + 3)],
-            # 3 in a diagonal row, given soldier front (right)
-            [[(x - 1, y - 1), (x - 2, y - 2)], [(x + 2, y + 2), (x + 3, y + 3)], (x + 1, y + 1), (x - 3, y - 3)],
-            # 3 in a diagonal row bottom-left to top-right
-            [[(x + 1, y + 1), (x + 2, y + 2)], [(x - 2, y - 2), (x - 3, y - 3)], (x - 1, y - 1), (x + 3, y + 3)],
-            # 3 in a diagonal row, given soldier back (left)
-            [[(x - 1, y + 1), (x - 2, y + 2)], [(x + 2, y - 2), (x + 3, y - 3)], (x + 1, y - 1), (x - 3, y + 3 )],
-            # 3 in a diagonal row, given soldier front (left)
-            [[(x + 1, y - 1), (x + 2, y - 2)], [(x - 2, y + 2), (x - 3, y + 3)], (x - 1, y + 1), (x + 3, y - 3)],
-            # horizontal
-            [[(x - 1, y), (x - 2, y)], [(x + 2, y), (x + 3, y)], (x + 1, y), (x - 3 , y)],
-            # horizontal 2
-            [[(x + 1, y), (x + 2, y)], [(x - 2, y), (x - 3, y)], (x - 1, y), (x + 3 , y)]
-        ]
-
-        for structure, shots, free, slide in cannon_cases:
+        for structure, shots, free, slide in CANNONS[soldier]:
             # check if there is a cannon structure
-            structure_exists = True
-            for pos in structure:
-                if Move.out_of_bounds(pos) or not player.soldier_at(pos):
-                    structure_exists = False
-                    break
-            
-            if not structure_exists:
+            if own & structure != structure:
                 continue
 
             # if the given place is empty
-            if not Move.out_of_bounds(slide) and not enemy.soldier_at(slide) and not player.soldier_at(slide) and player.get_town().get_pos() != slide and enemy.get_town().get_pos() != slide:
-                self._moves.append(Move(pos=slide, soldier=soldier.get_pos(), slide=True))
-            
+            if quiets and slide >= 0 and not occupied & BIT[slide] and own_town != slide and enemy_town != slide:
+                moves.append(new(origin + slide * 32 + Move.SLIDE))
+
             # check if there is the free position in front available so the cannon can shoot
-            if Move.out_of_bounds(free) or enemy.soldier_at(free) or player.soldier_at(free):
+            if not captures or free < 0 or occupied & BIT[free]:
                 continue
 
-            # check shot positions first, maybe the player can end the game. In this case other 
+            # check shot positions first, maybe the player can end the game. In this case other
             # moves are not interesting!
             # add possible shot positions
             for shot in shots:
                 # if the shoot will hit a solider of this player, than skip
-                if Move.out_of_bounds(shot) or player.soldier_at(shot):
+                if own & BIT[shot]:
                     break
-            
+
                 # if the shoot will hit a town, then mark this as finishing move and return just this move
                 # other moves are not interesting if the player is able to end the game
-                town = enemy.get_town().get_pos()
-                if town == shot:
-                    town_move = Move(pos=move, soldier=soldier.get_pos(), finish=town, shoot=True)
+                if shot == enemy_town:
+                    town_move = new(origin + shot * 32 + Move.FINISH + Move.SHOOT)
                     if ai:
                         self._moves = [town_move]
                         return
                     else:
-                        self._moves.append(town_move)
-                
-                # if the shoot wil hit an enemy soldier, then mark this move as 
+                        moves.append(town_move)
+
+                # if the shoot wil hit an enemy soldier, then mark this move as
                 # shoot/kill and break
-                kill = enemy.soldier_at(shot)
-                if kill:
-                    self._moves.append(Move(pos=shot, soldier=soldier.get_pos(), kill=kill.get_pos(), shoot=True))
+                if other & BIT[shot]:
+                    moves.append(new(origin + shot * 32 + Move.KILL + Move.SHOOT))
                     break
-            
+
 
         #
         #   RETREAT MOVES
@@ -164,19 +245,12 @@ class MoveGenerator:
 
         # retreat move if the soldier is threatened
         # the possible moves are 2 places behind the soldier and two places left/right of that position
-        retreat_pos = [
-            [(x - 2, y - 2 * d), (x - 1, y - d)], 
-            [(x, y - 2 * d), (x, y - d)], 
-            [(x + 2, y - 2 * d), (x + 1, y - d)]
-        ]
-        for threat in [(x - 1, y + d), (x, y + d), (x + 1, y + d), (x - 1, y), (x + 1, y), (x - 1, y - d), (x + 1, y - d), (x, y - d)]:
-            if enemy.soldier_at(threat):
-                for move, free in retreat_pos:
-                    if Move.out_of_bounds(move) or player.get_town().get_pos() == move or player.soldier_at(free) or enemy.soldier_at(free):
-                        continue
-
-                    if not player.soldier_at(move) and not enemy.soldier_at(move):
-                        self._moves.append(Move(pos=move, soldier=soldier.get_pos(), retreat=True))
+        if quiets and other & THREAT[d][soldier]:
+            for move, free in RETREAT[d][soldier]:
+                if own_town == move or occupied & (BIT[free] | BIT[move]):
+                    continue
+
+                moves.append(new(origin + move * 32 + Move.RETREAT))
 
     def refresh(self) -> None:
         self._moves = []
@@ -0,0 +1,289 @@
+import math
+import multiprocessing
+import time
+from stupid_engine.cannon.entities.cannon import CannonGame
+from stupid_engine.cannon.entities.move import Move
+from stupid_engine.cannon.entities.player import Player, PlayerType
+from stupid_engine.cannon.ai.time_manager import SearchTimeout, TimeManager
+from stupid_engine.cannon.ai.transposition import SharedTranspositionTable
+from typing import List, Tuple
+
+
+# state of a worker process, it is created once by the pool initializer and reused
+# for every task, so the tables of the searchers stay warm between the moves
+_game = None
+_searchers = None
+_alpha = None
+_stop = None
+_search_id = None
+
+
+def _init_worker(config: dict, alpha) -> None:
+    """
+    Creates the worker's own game and one searcher for each player, configured like
+    the searcher which created the pool.
+    """
+    global _game, _searchers, _alpha
+
+    # imported here, the alphabeta module imports this module
+    from stupid_engine.cannon.ai.alphabeta import AlphaBeta
+
+    light, dark = Player(PlayerType.LIGHT), Player(PlayerType.DARK)
+    _game = CannonGame(light, dark)
+    _searchers = {player.get_type(): AlphaBeta.from_dict(config, player, _game) for player in [light, dark]}
+    _alpha = alpha
+
+
+def _init_helper(config: dict, table_name: str, entries: int, stop) -> None:
+    """
+    Creates the worker's own game and searchers like _init_worker(), but the searchers
+    use the shared transposition table instead of their own one.
+    """
+    global _stop
+    _init_worker(config, None)
+
+    table = SharedTranspositionTable(entries, name=table_name)
+    for ai in _searchers.values():
+        ai._use_tt = True
+        ai._tt = table
+    _stop = stop
+
+
+def _run_helper(task: tuple) -> int:
+    """
+    Runs the iterative deepening of a helper until the stop signal is set or the time
+    is over. The results are only shared through the transposition table, so just the
+    amount of searched nodes is returned.
+    """
+    global _search_id
+    search_id, position, player_type, helper, depth, deadline = task
+
+    _game.set_position(position)
+    ai = _searchers[player_type]
+
+    # every second helper starts one iteration deeper, so the helpers do not all 
+    # search the same positions at the same time
+    depth += ai._delta_depth * (helper % 2)
+    if search_id != _search_id:
+        _search_id = search_id
+        ai._prepare_search(depth)
+    ai._extra_depth = depth
+
+    remaining = deadline - time.time() if deadline else None
+    if remaining is not None and remaining <= 0:
+        return 0
+
+    ai._timer = TimeManager(remaining, signal=_stop)
+    ai._timer.start()
+
+    score = None
+    try:
+        while not _stop.is_set():
+            score, _ = ai._search_root(score)
+            if ai._found_finishing_move:
+                break
+
+            ai._extra_depth += ai._delta_depth
+
+    except SearchTimeout:
+        pass
+
+    return ai._timer.nodes()
+
+
+def _search_root_move(task: tuple) -> Tuple[int, int, int]:
+    """
+    Searches a single root move and returns (index, score, nodes). The score is None
+    if the search ran out of time.
+    """
+    global _search_id
+    search_id, position, player_type, index, move_key, depth, beta, deadline = task
+
+    _game.set_position(position)
+    ai = _searchers[player_type]
+    player = ai._player
+    enemy = _game._get_enemy_player(player)
+
+    # the tables are aged once per search, not once per root move
+    if search_id != _search_id:
+        _search_id = search_id
+        ai._prepare_search(depth)
+    ai._extra_depth = depth
+
+    remaining = deadline - time.time() if deadline else None
+    if remaining is not None and remaining <= 0:
+        return index, None, 0
+
+    ai._timer = TimeManager(remaining)
+    ai._timer.start()
+
+    # a move is only interesting if it beats the best completed root move, the window
+    # is opened by one, so a move with the same score is still searched exactly and
+    # the move ordering decides between equal moves like in the sequential search
+    alpha = _alpha.value
+    if alpha != -math.inf:
+        alpha -= 1
+
+    move = ai._moves_generator.generate_move(player, enemy, move_key)
+    _game.apply(player, move)
+    try:
+        score, _ = ai._algorithm(-1 * beta, -1 * alpha, depth - 1, enemy, move_key, ply=1)
+        score *= -1
+    except SearchTimeout:
+        return index, None, ai._timer.nodes()
+    finally:
+        _game.revert()
+
+    with _alpha.get_lock():
+        if score > _alpha.value:
+            _alpha.value = score
+
+    return index, score, ai._timer.nodes()
+
+
+class RootSplitSearch:
+
+    def __init__(self, config: dict, workers: int) -> None:
+        """
+        Searches the moves of the root position in parallel. Every worker process keeps
+        its own copy of the game and its own searchers, the position is sent as compact
+        tuple of bitboards. The best score found so far is shared between the workers,
+        so the later root moves are searched with a narrow window. The pool is created
+        on the first search and kept until close() is called.
+        """
+        if workers < 2:
+            raise ValueError("The parallel search needs at least two workers.")
+
+        # the workers must not start a pool on their own
+        self._config = dict(config, wk=1)
+        self._workers = workers
+        self._pool = None
+        self._alpha = None
+        self._search_id = 0
+        self._nodes = 0
+
+    def _start(self) -> None:
+        self._alpha = multiprocessing.Value("d", -math.inf)
+        self._pool = multiprocessing.Pool(self._workers, _init_worker, (self._config, self._alpha))
+
+    def search(self, cannon: CannonGame, player: Player, moves: List[Move], depth: int,
+                    alpha: int, beta: int, deadline: float = None) -> Tuple[int, Move]:
+        """
+        Searches the given root moves to the given depth and returns the best score and
+        move. On equal scores the move coming first wins, so at a fixed depth without
+        selective pruning the result matches the sequential search of the moves in this
+        order. Raises a SearchTimeout if the deadline passed before all moves were 
+        searched, it carries the best of the moves searched completely.
+        """
+        if self._pool is None:
+            self._start()
+
+        self._alpha.value = alpha
+
+        position = cannon.get_position()
+        tasks = [(self._search_id, position, player.get_type(), index, move.get_key(), depth, beta, deadline)
+                    for index, move in enumerate(moves)]
+
+        results = [None] * len(moves)
+        timeout = False
+        for index, score, nodes in self._pool.imap_unordered(_search_root_move, tasks):
+            self._nodes += nodes
+            results[index] = score
+            timeout = timeout or score is None
+
+        best_score = -math.inf
+        best_move = None
+        for move, score in zip(moves, results):
+            if score is not None and score > best_score:
+                best_score = score
+                best_move = move
+
+        if timeout:
+            raise SearchTimeout(best_move)
+
+        return best_score, best_move
+
+    def new_search(self) -> None:
+        """
+        This method should be called before each search, the workers reset their killer
+        moves and age their tables on the first root move of a new search. The nodes are
+        counted per search.
+        """
+        self._search_id += 1
+        self._nodes = 0
+
+    def nodes(self) -> int:
+        return self._nodes
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+class LazySMPSearch:
+
+    def __init__(self, config: dict, workers: int, table: SharedTranspositionTable) -> None:
+        """
+        Runs helper processes next to the search of the main process (Lazy SMP). The 
+        helpers search the same position with their own iterative deepening and share
+        their results through the transposition table, so the main search finds more 
+        positions in the table. The result is always the one of the main search. The 
+        pool of helpers is created on the first search and kept until close() is called.
+        """
+        if workers < 2:
+            raise ValueError("The parallel search needs at least two workers.")
+
+        # the main process is one of the workers, the helpers use the shared table
+        self._config = dict(config, wk=1, r=False)
+        self._helpers = workers - 1
+        self._table = table
+        self._pool = None
+        self._stop = None
+        self._running = None
+        self._search_id = 0
+        self._nodes = 0
+
+    def _start(self) -> None:
+        self._stop = multiprocessing.Event()
+        self._pool = multiprocessing.Pool(self._helpers, _init_helper, 
+                                            (self._config, self._table.get_name(), self._table.capacity(), self._stop))
+
+    def start(self, cannon: CannonGame, player: Player, depth: int, deadline: float = None) -> None:
+        """
+        Starts the helpers on the current position, they run until stop() is called.
+        The nodes of the helpers are counted per search.
+        """
+        if self._pool is None:
+            self._start()
+
+        self._search_id += 1
+        self._nodes = 0
+        self._stop.clear()
+
+        position = cannon.get_position()
+        tasks = [(self._search_id, position, player.get_type(), helper, depth, deadline)
+                    for helper in range(self._helpers)]
+        self._running = self._pool.map_async(_run_helper, tasks, chunksize=1)
+
+    def stop(self) -> None:
+        """
+        Stops the helpers and waits until all of them returned.
+        """
+        if self._running is None:
+            return
+
+        self._stop.set()
+        self._nodes += sum(self._running.get())
+        self._running = None
+
+    def nodes(self) -> int:
+        return self._nodes
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self.stop()
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
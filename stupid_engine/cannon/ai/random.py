@@ -1,4 +1,5 @@
 from stupid_engine.cannon.ai.ai import BaseAI
+from stupid_engine.cannon.ai.move_generator import MoveGenerator
 from stupid_engine.cannon.entities.move import Move
 from stupid_engine.cannon.entities.player import Player, PlayerType
 from stupid_engine.cannon.entities.cannon import CannonGame
@@ -11,12 +12,16 @@ class RandomAI(BaseAI):
 
     DELAY = 0.5
 
-    def __init__(self, player: Player, cannon: CannonGame) -> None:
+    def __init__(self, player: Player, cannon: CannonGame, delay: float = DELAY) -> None:
         """
-        This is a random AI which acts greedy if it can.
+        This is a random AI which acts greedy if it can. The delay is waited after each
+        move, so a human can follow the game.
         """
         super().__init__(player, cannon)
 
+        self._delay = delay
+        self._moves_generator = MoveGenerator()
+
     def set_town_position(self, positions: List[Move]) -> Move:
         """
         This method places a position for the town randomly
@@ -26,43 +31,36 @@ class RandomAI(BaseAI):
 
     def play_turn(self, state: Dict) -> bool:
         """
-        This method lets this AI play a turn. The soldier and move 
-        is selected randomly if the moves do not contain killing or 
+        This method lets this AI play a turn. The soldier and move
+        is selected randomly if the moves do not contain killing or
         finishing moves.
         """
-        soldiers, town = state[self._player.get_type()]
-
-        all_moves = []
-        for soldier in soldiers:
-            moves = self._cannon.moves(self._player, soldier)
-
-            if moves != []:
-                # defense first
-                for move in moves:
-                    if move.is_retreat_move():
-                        self._cannon.execute(self._player, move)
-                        time.sleep(RandomAI.DELAY)
-                        return True
+        enemy = self._cannon._get_enemy_player(self._player)
+        moves = self._moves_generator.generate_moves(self._player, enemy)
 
-                # attack second
-                for move in moves:
-                    if move.is_kill_move() or move.is_finish_move():
-                        self._cannon.execute(self._player, move)
-                        time.sleep(RandomAI.DELAY)
-                        return True
-                
-                # otherwise choose randomly
-                all_moves.append((soldier, random.choice(moves)))
-        
         # this only occurs if there are no moves
         # in this case the opponent wins the game
-        if len(all_moves) == 0:
-            enemy_type = PlayerType.DARK if self._player.get_type() == PlayerType.LIGHT else PlayerType.LIGHT
-            self._cannon.end_game(enemy_type)
+        if len(moves) == 0:
+            self._cannon.end_game(enemy.get_type())
             return False
 
-        soldier, move = random.choice(all_moves)
-        self._player.move_soldier(move)
+        # defense first, attack second, otherwise choose randomly
+        retreats = [move for move in moves if move.is_retreat_move()]
+        attacks = [move for move in moves if move.is_kill_move() or move.is_finish_move()]
+        move = (retreats or attacks or [random.choice(moves)])[0]
+
+        self._cannon.execute(self._player, move)
+
+        if self._delay:
+            time.sleep(self._delay)
+        return True
+
+    def to_dict(self) -> dict:
+        d = dict()
+        d["ai_type"] = "random"
+        d["p"] = self._player.get_type()
+        d["dl"] = self._delay
+        return d
 
-        time.sleep(RandomAI.DELAY)
-        return True
\ No newline at end of file
+    def from_dict(d: dict, player: Player, cannon: CannonGame):
+        return RandomAI(player, cannon, d.get("dl", RandomAI.DELAY))
@@ -0,0 +1,117 @@
+import time
+
+
+class SearchTimeout(Exception):
+    """
+    Raised by the time manager inside of the search, so the search unwinds immediately.
+    A search which already knows a best move of the interrupted iteration can pass it on.
+    """
+    def __init__(self, best_move=None) -> None:
+        super().__init__()
+        self.best_move = best_move
+
+
+class TimeManager:
+
+    # share of the time limit after which no new iteration is started
+    SOFT_LIMIT = 0.6
+
+    # the time is checked every CHECK_EVERY nodes, this has to be a power of two
+    CHECK_EVERY = 256
+
+    def __init__(self, time_limit: float, soft_limit: float = None, check_every: int = CHECK_EVERY, 
+                    signal=None) -> None:
+        """
+        The time manager controls the iterative deepening. The time limit is a hard limit,
+        a running search is aborted by raising a SearchTimeout once it is exceeded. After
+        the soft limit no new iteration is started, neither is an iteration whose predicted
+        duration does not fit into the remaining time. The prediction uses the branching
+        factor observed between the previous iterations. Without a time limit a single
+        iteration is searched. The search is also aborted once the optional signal, an
+        event shared with other processes, is set.
+        """
+        self._hard_limit = time_limit
+        self._soft_limit = soft_limit if soft_limit is not None else (time_limit or 0) * TimeManager.SOFT_LIMIT
+        self._mask = check_every - 1
+        self._signal = signal
+
+        self._start = 0
+        self._nodes = 0
+        self._stopped = False
+        self._iterations = []
+
+    def start(self) -> None:
+        """
+        Starts the clock for a new search.
+        """
+        self._start = time.time()
+        self._nodes = 0
+        self._stopped = False
+        self._iterations = []
+
+    def stop(self) -> None:
+        """
+        Aborts the running search at the next time check, e.g. if another thread needs
+        the search result now.
+        """
+        self._stopped = True
+
+    def node(self) -> None:
+        """
+        Counts a searched node and raises a SearchTimeout if the search has to end.
+        """
+        self._nodes += 1
+        if self._nodes & self._mask == 0:
+            if self._stopped or (self._hard_limit and time.time() - self._start > self._hard_limit):
+                raise SearchTimeout()
+
+            if self._signal is not None and self._signal.is_set():
+                raise SearchTimeout()
+
+    def deadline(self) -> float:
+        """
+        Returns the point in time at which the search has to end, or None without a time limit.
+        """
+        return self._start + self._hard_limit if self._hard_limit else None
+
+    def elapsed(self) -> float:
+        return time.time() - self._start
+
+    def nodes(self) -> int:
+        return self._nodes
+
+    def iteration_done(self) -> None:
+        """
+        Registers a completed iteration, its duration is used for the prediction.
+        """
+        self._iterations.append(self.elapsed() - sum(self._iterations))
+
+    def branching_factor(self) -> float:
+        """
+        Returns the growth of the search time from one iteration to the next one.
+        """
+        if len(self._iterations) < 2 or self._iterations[-2] <= 0:
+            return None
+
+        return self._iterations[-1] / self._iterations[-2]
+
+    def can_start_iteration(self) -> bool:
+        """
+        Checks if there is enough time left to complete another iteration.
+        """
+        if not self._hard_limit:
+            return not self._iterations
+
+        if self._stopped:
+            return False
+
+        elapsed = self.elapsed()
+        if elapsed > self._soft_limit:
+            return False
+
+        # the next iteration takes about the last one times the branching factor
+        factor = self.branching_factor()
+        if factor is not None and elapsed + self._iterations[-1] * factor > self._hard_limit:
+            return False
+
+        return True
@@ -0,0 +1,199 @@
+from multiprocessing import shared_memory
+from typing import Tuple
+import numpy as np
+
+
+class TranspositionTable:
+
+    # bound types of a stored score
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    # estimated size of one entry in bytes: the tuple, its ints and the slot of the list
+    ENTRY_SIZE = 128
+
+    def __init__(self, entries: int = None, mb: float = 16) -> None:
+        """
+        A transposition table with a fixed amount of slots. Each entry holds the key, the
+        searched depth, the score, the bound type of the score, the key of the best move and
+        the age of the search which stored it. The capacity is given in entries or in MB.
+        The table is kept between moves, only the age changes, so the next search starts
+        with the knowledge of the previous one.
+        """
+        if entries is None:
+            entries = int(mb * 2**20 / TranspositionTable.ENTRY_SIZE)
+
+        if entries < 1:
+            raise ValueError("The transposition table needs at least one entry.")
+
+        self._size = entries
+        self._table = [None] * entries
+        self._age = 0
+        self._filled = 0
+
+    def new_search(self) -> None:
+        """
+        This method should be called before each search, entries of older searches are
+        replaced first.
+        """
+        self._age = (self._age + 1) & 0xff
+
+    def probe(self, key: int) -> Tuple[int, int, int, int, int, int]:
+        """
+        Returns the entry (key, depth, score, bound, move key, age) stored for the given
+        key, or None if the position is not known.
+        """
+        entry = self._table[key % self._size]
+        if entry is not None and entry[0] == key:
+            return entry
+
+        return None
+
+    def store(self, key: int, depth: int, score: int, bound: int, move_key: int = None) -> bool:
+        """
+        Stores a search result. An occupied slot is only replaced, if it contains the same
+        position, if it was stored by an older search or if the new result was searched at
+        least as deep. Returns true if the entry was stored.
+        """
+        index = key % self._size
+        old = self._table[index]
+
+        if old is None:
+            self._filled += 1
+
+        elif old[0] == key:
+            # keep the best move of a position if the new result has none
+            if move_key is None:
+                move_key = old[4]
+
+        elif old[5] == self._age and old[1] > depth:
+            return False
+
+        self._table[index] = (key, depth, score, bound, move_key, self._age)
+        return True
+
+    def clear(self) -> None:
+        self._table = [None] * self._size
+        self._filled = 0
+
+    def capacity(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return self._filled
+
+
+class SharedTranspositionTable:
+
+    # size of one entry in bytes, two 64 bit words
+    ENTRY_SIZE = 16
+
+    # layout of the data word: score (32 bits), depth (7 bits), bound (2 bits), 
+    # age (8 bits) and the move key + 1 (15 bits, 0 if there is no move)
+    SCORE_OFFSET = 2**31
+    DEPTH_SHIFT = 32
+    BOUND_SHIFT = 39
+    AGE_SHIFT = 41
+    MOVE_SHIFT = 49
+
+    def __init__(self, entries: int = None, mb: float = 16, name: str = None) -> None:
+        """
+        A transposition table in shared memory, which can be used by multiple processes
+        at the same time without any locks. Each entry consists of two words: the key 
+        XOR the data and the data. If two processes write the same entry at the same time,
+        the words do not belong together anymore and the entry is ignored by probe().
+        Other processes attach to the table by passing its name. The first word of the 
+        memory holds the age.
+        """
+        if entries is None:
+            entries = int(mb * 2**20 / SharedTranspositionTable.ENTRY_SIZE)
+
+        if entries < 1:
+            raise ValueError("The transposition table needs at least one entry.")
+
+        self._size = entries
+        self._owner = name is None
+        if self._owner:
+            self._memory = shared_memory.SharedMemory(create=True, size=(2 * entries + 1) * 8)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+
+        self._words = np.ndarray((2 * entries + 1,), dtype=np.uint64, buffer=self._memory.buf)
+        if self._owner:
+            self._words[:] = 0
+
+    def get_name(self) -> str:
+        return self._memory.name
+
+    def new_search(self) -> None:
+        """
+        This method should be called before each search, entries of older searches are
+        replaced first. Only the process which created the table changes the age.
+        """
+        if self._owner:
+            self._words[0] = (int(self._words[0]) + 1) & 0xff
+
+    def probe(self, key: int) -> Tuple[int, int, int, int, int, int]:
+        """
+        Returns the entry (key, depth, score, bound, move key, age) stored for the given
+        key, or None if the position is not known.
+        """
+        index = 2 * (key % self._size) + 1
+        check = int(self._words[index])
+        data = int(self._words[index + 1])
+        if data == 0 or check ^ data != key:
+            return None
+
+        return self._unpack(key, data)
+
+    def store(self, key: int, depth: int, score: int, bound: int, move_key: int = None) -> bool:
+        """
+        Stores a search result. An occupied slot is only replaced, if it contains the same
+        position, if it was stored by an older search or if the new result was searched at
+        least as deep. Returns true if the entry was stored.
+        """
+        index = 2 * (key % self._size) + 1
+        age = int(self._words[0])
+        old = int(self._words[index + 1])
+
+        if old:
+            _, old_depth, _, _, old_move, old_age = self._unpack(key, old)
+            if int(self._words[index]) ^ old == key:
+                # keep the best move of a position if the new result has none
+                if move_key is None:
+                    move_key = old_move
+
+            elif old_age == age and old_depth > depth:
+                return False
+
+        T = SharedTranspositionTable
+        data = (int(score) + T.SCORE_OFFSET) | min(depth, 127) << T.DEPTH_SHIFT | bound << T.BOUND_SHIFT \
+                    | age << T.AGE_SHIFT | (move_key + 1 if move_key is not None else 0) << T.MOVE_SHIFT
+        self._words[index] = key ^ data
+        self._words[index + 1] = data
+        return True
+
+    def _unpack(self, key: int, data: int) -> Tuple[int, int, int, int, int, int]:
+        T = SharedTranspositionTable
+        move_key = (data >> T.MOVE_SHIFT) - 1
+        return (key, (data >> T.DEPTH_SHIFT) & 0x7f, (data & 0xffffffff) - T.SCORE_OFFSET, 
+                    (data >> T.BOUND_SHIFT) & 0x3, move_key if move_key >= 0 else None, (data >> T.AGE_SHIFT) & 0xff)
+
+    def clear(self) -> None:
+        self._words[1:] = 0
+
+    def capacity(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        """
+        Detaches from the shared memory, the process which created the table also frees it.
+        """
+        self._words = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._words[2::2]))
@@ -0,0 +1,130 @@
+"""
+Analyses many positions without any window: every position is searched by a fresh
+AlphaBeta AI in a pool of processes and the results are returned as soon as a search
+is finished. The positions are given as position strings or as states of the savegame.
+
+Usage: python -m stupid_engine.cannon.analysis [--depth N] [--time T] [--engine "pvs=True"] [--workers N] POSITION|FILE ...
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import pickle
+from stupid_engine.cannon.entities.cannon import CannonGame
+from stupid_engine.cannon.entities.player import Player, PlayerType
+from stupid_engine.cannon.headless import create_ai, engine_config
+from stupid_engine.cannon.perft import create_game, move_name
+from stupid_engine.cannon.tournament import parse_engine
+from typing import Dict, Iterable, Iterator, Tuple, Union
+
+
+# the default limits of the search: the depth and the time in seconds. With a time
+# limit the iterative deepening starts at the depth and goes on until the time is over
+ANALYSIS_LIMITS = {"depth": 4, "time": None}
+
+# the default engine options, given by the names of the arguments of AlphaBeta
+ANALYSIS_OPTIONS = {"pvs": True, "null_move": True, "lmr": True}
+
+# the maximum amount of moves of the principal variation
+PV_LENGTH = 16
+
+
+def position_string(position: Union[str, Dict]) -> str:
+    """
+    Returns the position string of a position string or of the state of a savegame,
+    the dictionary with the game state and the active player.
+    """
+    if isinstance(position, str):
+        return position
+
+    cannon = CannonGame(Player(PlayerType.LIGHT), Player(PlayerType.DARK))
+    cannon.set_state(position["game_state"])
+    return cannon.get_position_string(position["active_player"])
+
+
+def analyze_position(job: Tuple[int, str, Dict]) -> Dict:
+    """
+    Searches a single position given as (index, position string, engine configuration)
+    and returns the result of the search.
+    """
+    index, position, config = job
+    cannon, player = create_game(position)
+    ai = create_ai(config, player, cannon)
+
+    try:
+        best_move, elapsed = ai._run_search()
+        line = ai._principal_variation(best_move, PV_LENGTH) if best_move else []
+        nodes = ai._search_nodes()
+    finally:
+        ai.close()
+
+    score = ai._completed_score
+    return {"index": index, "position": position, "move": move_name(best_move) if best_move else None,
+            "key": best_move.get_key() if best_move else None,
+            "score": int(score) if score is not None and abs(score) != math.inf else None,
+            "depth": ai._completed_depth, "nodes": nodes, "time": elapsed,
+            "pv": [move_name(move) for move in line]}
+
+
+def analyze_positions(positions: Iterable[Union[str, Dict]], limits: Dict = None, workers: int = None,
+                        config: Dict = None) -> Iterator[Dict]:
+    """
+    Searches all positions in a pool of processes and yields the results as soon as a
+    search is finished, so they are not in the order of the positions. Each result
+    contains the index of the position, the best move (as text and key), the score,
+    the depth, the amount of nodes, the time and the principal variation. The limits
+    are "depth" and "time", see ANALYSIS_LIMITS, they replace the ones of the engine
+    configuration (see engine_config()). By default ANALYSIS_OPTIONS and one process
+    per CPU are used.
+    """
+    if config is not None and config["ai_type"] != "ab":
+        raise ValueError("Only the AlphaBeta AI can analyse positions.")
+
+    limits = dict(ANALYSIS_LIMITS, **(limits or {}))
+    config = dict(config or engine_config(**ANALYSIS_OPTIONS), d=limits["depth"], t=limits["time"])
+
+    jobs = ((index, position_string(position), config) for index, position in enumerate(positions))
+    if workers == 1:
+        for job in jobs:
+            yield analyze_position(job)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(analyze_position, jobs):
+            yield result
+
+
+def load_positions(path: str) -> list:
+    """
+    Returns the positions of a file: the state of a savegame, or a text file with one
+    position string per line.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    try:
+        return [pickle.loads(data)]
+    except pickle.UnpicklingError:
+        return [line.strip() for line in data.decode().splitlines() if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Searches many positions and prints the results as JSON lines.")
+    parser.add_argument("positions", nargs="+", help="position strings, savegames or files with position strings")
+    parser.add_argument("--depth", type=int, default=ANALYSIS_LIMITS["depth"])
+    parser.add_argument("--time", type=float, default=ANALYSIS_LIMITS["time"])
+    parser.add_argument("--engine", default=None, help="options of the engine, e.g. \"pvs=True\"")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    positions = []
+    for item in args.positions:
+        try:
+            positions.extend(load_positions(item))
+        except (FileNotFoundError, IsADirectoryError):
+            positions.append(item)
+
+    config = parse_engine(args.engine) if args.engine is not None else None
+    limits = {"depth": args.depth, "time": args.time}
+    for result in analyze_positions(positions, limits, args.workers, config):
+        print(json.dumps(result), flush=True)
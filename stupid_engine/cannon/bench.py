@@ -0,0 +1,155 @@
+"""
+Searches a fixed set of positions to a fixed depth and reports the nodes, the speed and
+the statistics of the search for each of them. Unlike the statistics printed during a
+game, the result is reproducible: the positions, the depth and the zobrist keys are
+always the same. The result can be written as JSON and compared with the result of
+another checkout.
+
+Usage: python -m stupid_engine.cannon.bench [--engine "pvs=True"] [--depth N] [--output FILE] [--compare FILE [FILE]]
+"""
+import argparse
+import json
+import math
+import platform
+from stupid_engine.backend.misc.stats import Statistics
+from stupid_engine.cannon.headless import create_ai
+from stupid_engine.cannon.perft import PERFT_POSITIONS, create_game, move_name
+from stupid_engine.cannon.tournament import parse_engine
+from typing import Dict, List
+
+
+# the positions of the benchmark (name, position string), the positions of the perft
+# tool without the ones which are decided by the first move
+BENCH_POSITIONS = [(name, position) for name, position, expected in PERFT_POSITIONS if expected[1] > 1]
+
+# the default search of the benchmark, the engine options are given like in the tournament
+BENCH_DEPTH = 6
+BENCH_ENGINE = "pvs=True,null_move=True,lmr=True"
+
+# a change of the nodes per second by less than this share is reported as noise
+BENCH_NOISE = 0.05
+
+
+def bench_position(config: Dict, position: str) -> Dict:
+    """
+    Searches a single position with a fresh AI and returns the result of the search.
+    """
+    cannon, player = create_game(position)
+    ai = create_ai(config, player, cannon)
+
+    try:
+        with ai._profiler.profile():
+            best_move, elapsed = ai._run_search()
+        nodes = ai._search_nodes()
+        ai._stats.add_ply(ai._completed_depth, elapsed, nodes)
+        ai._stats.update()
+    finally:
+        ai.close()
+
+    stats = ai._stats
+    score = ai._completed_score
+    return {"nodes": nodes, "time": elapsed, "nps": nodes / max(elapsed, 1e-9), "depth": ai._completed_depth,
+            "move": move_name(best_move) if best_move else None,
+            "score": int(score) if score is not None and abs(score) != math.inf else None,
+            "tt_stored": int(stats.get(Statistics.MOVES_STORED)), "tt_loaded": int(stats.get(Statistics.MOVES_LOADED)),
+            "root_pruning": float(stats.get(Statistics.ROOT_PRUNING)),
+            "subroot_pruning": float(stats.get(Statistics.AVERAGE_SUBROOT_PRUNING)),
+            "first_move_cutoffs": float(stats.get(Statistics.FIRST_MOVE_CUTOFFS))}
+
+
+def bench(engine: str = BENCH_ENGINE, depth: int = BENCH_DEPTH, positions: List = BENCH_POSITIONS,
+            verbose: bool = True) -> Dict:
+    """
+    Searches all positions and returns the result of the benchmark: the engine options,
+    the depth, the result of each position and the totals.
+    """
+    config = parse_engine(engine)
+    config["d"] = depth
+
+    results = []
+    for name, position in positions:
+        result = dict(name=name, position=position, **bench_position(config, position))
+        results.append(result)
+
+        if verbose:
+            print(format_result(result))
+
+    nodes = sum(result["nodes"] for result in results)
+    elapsed = sum(result["time"] for result in results)
+    total = {"nodes": nodes, "time": elapsed, "nps": nodes / max(elapsed, 1e-9)}
+
+    if verbose:
+        print(f"total: {nodes} nodes in {elapsed:.2f}s, {total['nps']:.0f} nodes per second")
+
+    return {"engine": engine, "depth": depth, "python": platform.python_version(), "positions": results,
+            "total": total}
+
+
+def format_result(result: Dict) -> str:
+    return f"{result['name']:<12} {result['nodes']:>9} nodes {result['time']:>7.2f}s {result['nps']:>8.0f} nps  " + \
+        f"tt {result['tt_stored']}/{result['tt_loaded']}  first cut {result['first_move_cutoffs']:.2f}  " + \
+        f"best {result['move']} ({result['score']})"
+
+
+def compare(base: Dict, new: Dict) -> List[str]:
+    """
+    Compares two benchmark results position by position. Returns the lines of the report:
+    the change of the nodes and the speed and if the best move changed.
+    """
+    lines = []
+    if base["engine"] != new["engine"] or base["depth"] != new["depth"]:
+        lines.append(f"warning: different searches ({base['engine']}, depth {base['depth']}) and " +
+                        f"({new['engine']}, depth {new['depth']})")
+
+    def change(old: float, value: float) -> str:
+        return f"{(value / old - 1) * 100:+.1f}%" if old else "n/a"
+
+    old_results = {result["name"]: result for result in base["positions"]}
+    for result in new["positions"]:
+        old = old_results.get(result["name"])
+        if old is None or old["position"] != result["position"]:
+            lines.append(f"{result['name']:<12} not in the base result")
+            continue
+
+        move = "same move" if old["move"] == result["move"] else f"best move changed: {old['move']} to {result['move']}"
+        lines.append(f"{result['name']:<12} nodes {old['nodes']:>9} -> {result['nodes']:>9} " +
+                        f"({change(old['nodes'], result['nodes'])})  nps {change(old['nps'], result['nps'])}  {move}")
+
+    old, total = base["total"], new["total"]
+    speed = total["nps"] / old["nps"] - 1 if old["nps"] else 0
+    verdict = "noise" if abs(speed) < BENCH_NOISE else "faster" if speed > 0 else "slower"
+    lines.append(f"total        nodes {old['nodes']:>9} -> {total['nodes']:>9} ({change(old['nodes'], total['nodes'])})  " +
+                    f"nps {change(old['nps'], total['nps'])} ({verdict})  " +
+                    f"time {old['time']:.2f}s -> {total['time']:.2f}s")
+    return lines
+
+
+def load_result(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Searches a fixed set of positions to a fixed depth.")
+    parser.add_argument("--engine", default=BENCH_ENGINE, help="options of the engine, e.g. \"pvs=True\"")
+    parser.add_argument("--depth", type=int, default=BENCH_DEPTH)
+    parser.add_argument("--position", help="position string, by default the benchmark positions are used")
+    parser.add_argument("--output", help="write the result as JSON to this file")
+    parser.add_argument("--compare", nargs="+", metavar="FILE",
+                        help="compare the run with this result, or two stored results without running")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        print("\n".join(compare(load_result(args.compare[0]), load_result(args.compare[1]))))
+        raise SystemExit(0)
+
+    positions = [("position", args.position)] if args.position else BENCH_POSITIONS
+    result = bench(args.engine, args.depth, positions)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=1)
+
+    if args.compare:
+        print()
+        print("\n".join(compare(load_result(args.compare[0]), result)))
@@ -0,0 +1,120 @@
+"""
+Bitboard helpers for the Cannon board. Every square (x, y) of the 10x10 board
+is mapped to the index y * 10 + x, so a whole army fits into one 100-bit integer.
+"""
+from typing import Iterator, Tuple
+
+
+SIZE = 10
+SQUARES = SIZE * SIZE
+FULL = (1 << SQUARES) - 1
+
+# single bit of each square and the coordinates of each square, this avoids
+# creating tuples or shifting ints while the search runs
+BIT = [1 << sq for sq in range(SQUARES)]
+POS = [(sq % SIZE, sq // SIZE) for sq in range(SQUARES)]
+
+# masks of the outer columns, used to prevent shifts from wrapping around the board
+FILE_LEFT = sum(BIT[y * SIZE] for y in range(SIZE))
+FILE_RIGHT = sum(BIT[y * SIZE + SIZE - 1] for y in range(SIZE))
+
+
+def square(pos: Tuple[int, int]) -> int:
+    """
+    Returns the square index of the given position.
+    """
+    x, y = pos
+    return y * SIZE + x
+
+
+def on_board(x: int, y: int) -> bool:
+    return 0 <= x < SIZE and 0 <= y < SIZE
+
+
+# int.bit_count() is only available since Python 3.10
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(bits: int) -> int:
+        return bin(bits).count("1")
+
+
+def squares(bits: int) -> Iterator[int]:
+    """
+    Iterates over the indices of all set bits, starting with the lowest square.
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def shift(bits: int, dx: int, dy: int) -> int:
+    """
+    Moves every bit of the mask by the given direction. Bits leaving the board
+    are dropped instead of wrapping around into the next row.
+    """
+    for _ in range(abs(dx)):
+        if dx > 0:
+            bits = (bits & ~FILE_RIGHT) << 1
+        else:
+            bits = (bits & ~FILE_LEFT) >> 1
+
+    offset = dy * SIZE
+    if offset > 0:
+        bits <<= offset
+    else:
+        bits >>= -offset
+
+    return bits & FULL
+
+
+def neighbours(bits: int) -> int:
+    """
+    Returns the mask of all squares adjacent to at least one square of the given mask.
+    """
+    mask = 0
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if dx or dy:
+                mask |= shift(bits, dx, dy)
+
+    return mask
+
+
+def _build_walls():
+    # the defense wall of a town are the squares left and right of it and the
+    # three squares in front of it, the front depends on the playing direction
+    # .....
+    # .sss.
+    # .sts.
+    #--------
+    walls = dict()
+    for d in (-1, 1):
+        walls[d] = []
+        for sq in range(SQUARES):
+            town = BIT[sq]
+            front = shift(town, 0, d)
+            walls[d].append(shift(town, -1, 0) | shift(town, 1, 0) | front | shift(front, -1, 0) | shift(front, 1, 0))
+
+    return walls
+
+
+# defense wall masks indexed by the playing direction and the square of the town
+WALL = _build_walls()
+
+
+def _build_zones(distance: int):
+    zones = []
+    for sq in range(SQUARES):
+        zone = BIT[sq]
+        for _ in range(distance):
+            zone |= neighbours(zone)
+        zones.append(zone ^ BIT[sq])
+
+    return zones
+
+
+# squares within the range of a cannon shot around each square, an enemy in this
+# zone around a town may be able to finish the game soon
+TOWN_ZONE = _build_zones(3)
@@ -1,64 +1,241 @@
 import math
 from stupid_engine.cannon.ai.move_generator import MoveGenerator
 from stupid_engine.cannon.entities.move import Move
-from stupid_engine.cannon.entities.figures import CannonFigure, CannonSoldier
 from stupid_engine.cannon.entities.player import Player, PlayerType
+from stupid_engine.cannon.entities.bitboard import BIT, POS, SIZE, SQUARES, WALL, popcount, square, squares
 from typing import Dict, List, Tuple
 import random
+import re
 import numpy as np
 from copy import copy
 from multiprocessing import Pool
 
 
+# the random values of the zobrist hashing are created from a fixed seed, so every
+# game in every process computes the same keys. This allows sharing a transposition 
+# table between processes and storing positions by their key
+ZOBRIST_SEED = 0xCA2202
+
+def _build_zobrist():
+    rng = random.Random(ZOBRIST_SEED)
+
+    # one entry for each piece at eache square and one entry for the player playing
+    player = (rng.getrandbits(64), rng.getrandbits(64))
+    pieces = [[rng.getrandbits(64) for _ in range(4)] for _ in range(SQUARES)]
+    return player, pieces
+
+
+ZOBRIST_PLAYER, ZOBRIST = _build_zobrist()
+
+# playing direction of each player, used to look up the defense wall
+DIRECTION = {PlayerType.LIGHT: -1, PlayerType.DARK: 1}
+
+# each entry of the undo stack uses this many slots: the boards of both players, the 
+# zobrist key and the army and wall of both players before the move
+UNDO_SLOTS = 7
+
+
+def _build_eval_tables():
+    """
+    Creates the tables used by eval_batch(), indexed by the square of a town and the
+    square of a move. The values are calculated exactly like in eval().
+    """
+    distance = np.zeros((SQUARES, SQUARES), dtype=np.int64)
+    reach = np.zeros((SQUARES, SQUARES), dtype=bool)
+    for town in range(SQUARES):
+        town_x, town_y = POS[town]
+        for sq in range(SQUARES):
+            x, y = POS[sq]
+            distance[town][sq] = round(math.sqrt(math.pow(town_x - x, 2) + math.pow(town_y - y, 2)))
+
+            # the soldier is able to reach the town
+            dir_x = 1 if town_x > x else -1
+            reach[town][sq] = x + abs(town_y - y) * dir_x - town_x > -2
+
+    # squares of the defense wall as array for each playing direction
+    walls = {d: np.array([[bool(WALL[d][town] & BIT[sq]) for sq in range(SQUARES)] for town in range(SQUARES)],
+                dtype=np.int64) for d in (-1, 1)}
+
+    return distance, reach, walls
+
+
+TOWN_DISTANCE, TOWN_REACH, WALL_SQUARES = _build_eval_tables()
+
+
+def _describe(move: Move) -> str:
+    """
+    Returns the end of the message printed for a played move.
+    """
+    if move.is_finish_move():
+        return ", bombed the town down!" if move.is_shoot() else ", climbed the town's walls!"
+
+    if move.is_shoot():
+        return " and hits an enemy!"
+
+    if move.is_kill_move():
+        return ", swordfight won!"
+
+    msg = "what a rough ground"
+    if move.is_retreat_move():
+        msg = "what a coward"
+
+    if move.is_sliding_move():
+        msg = "those cannons are heavy"
+
+    return f", {msg}."
+
+
 class CannonGame:
-    def __init__(self, p_light: Player, p_dark: Player) -> None:
+    def __init__(self, p_light: Player, p_dark: Player, debug_hash: bool = False) -> None:
         self._p_light = p_light
         self._p_dark = p_dark
 
         self._on_finish_callback = None
+        self._on_move_callback = None
+
+        # random values for the zobrist hashing
+        self._zobrist_player = ZOBRIST_PLAYER
+        self._zobrist = ZOBRIST
+
+        # the zobrist key of all soldiers is kept up to date by apply() and revert(),
+        # the debug mode compares it to a full recomputation on every hash() call
+        self._key = self._soldiers_key()
+        self._debug_hash = debug_hash
 
-        # initialize random values for the zobrist hashing
-        # one entry for each piece at eache square and one entry for the player playing
-        self._zobrist_player = (random.randint(0, 2**64 - 1), random.randint(0, 2**64 - 1))
-        self._zobrist = [[[random.randint(0, 2**64 - 1) for _ in range(4)] for _ in range(10)] for _ in range(10)]
+        # the evaluation uses the size of each army and the amount of soldiers in the
+        # defense wall of each town, these are also kept up to date by apply() and 
+        # revert(). The wall is counted for the town square it was counted with
+        self._army = dict()
+        self._wall = dict()
+        self._wall_town = dict()
+        self._count_eval_state()
+
+        # moves applied by the search push the state before the move onto the undo
+        # stack, revert() pops it. The stack grows to the deepest search once and its
+        # slots are reused afterwards, so no objects are created per move
+        self._undo_stack = []
+        self._undo_top = 0
     
     def set_on_finish(self, callback) -> None:
         self._on_finish_callback = callback
+
+    def set_on_move(self, callback) -> None:
+        """
+        The callback is called with the player and the move for every move played in 
+        the game, moves executed while testing are ignored.
+        """
+        self._on_move_callback = callback
     
     def _get_enemy_player(self, player: Player) -> Player:
         return self._p_dark if player == self._p_light else self._p_light
     
-    def hash(self, player_type: PlayerType, state: Dict = None):
+    def _soldiers_key(self) -> int:
         """
-        Uses Zobrist hash function to calulate the hash of the current board state.
+        Calculates the zobrist key of all soldiers from scratch.
         """
-        if state is None:
-            state = self.get_state()
-
-        hash = 0
+        key = 0
 
         # iterate over every piece and get its random value
         # then store the random value into the has container using XOR
-        for soldier in state[PlayerType.LIGHT][0]:
-            x, y = soldier
-            hash ^= self._zobrist[x][y][0]
-        
-        if state[PlayerType.LIGHT][1]:
-            x, y = self._p_light.get_town().get_pos()
-            hash ^= self._zobrist[x][y][1]
-        
-        for soldier in state[PlayerType.DARK][0]:
-            x, y = soldier
-            hash ^= self._zobrist[x][y][2]
-        
-        if state[PlayerType.DARK][1]:
-            x, y = self._p_dark.get_town().get_pos()
-            hash ^= self._zobrist[x][y][3]
+        for sq in squares(self._p_light.get_board()):
+            key ^= self._zobrist[sq][0]
+
+        for sq in squares(self._p_dark.get_board()):
+            key ^= self._zobrist[sq][2]
+
+        return key
+
+    def hash(self, player_type: PlayerType):
+        """
+        Uses Zobrist hash function to calulate the hash of the current board state. The 
+        soldiers are part of the running key, so only the towns and the player to move 
+        are added here.
+        """
+        if self._debug_hash and self._key != self._soldiers_key():
+            raise ValueError("The running hash does not match the board!")
+
+        hash = self._key
+
+        if self._p_light.is_town_placed():
+            hash ^= self._zobrist[self._p_light.get_town_square()][1]
+
+        if self._p_dark.is_town_placed():
+            hash ^= self._zobrist[self._p_dark.get_town_square()][3]
 
         player_index = 0 if player_type == PlayerType.LIGHT else 1
         hash ^= self._zobrist_player[player_index]
 
-        return hash     
+        return hash
+
+    def _count_eval_state(self) -> None:
+        """
+        Counts the armies and the defense walls from scratch.
+        """
+        for player in (self._p_light, self._p_dark):
+            self._count_wall(player)
+            self._army[player.get_type()] = player.army_size()
+
+    def _count_wall(self, player: Player) -> None:
+        player_type = player.get_type()
+        town = player.get_town_square()
+        self._wall_town[player_type] = town
+        self._wall[player_type] = popcount(player.get_board() & WALL[DIRECTION[player_type]][town])
+
+    def _check_towns(self) -> None:
+        """
+        Counts the walls of both players again, if a town was placed since they were
+        counted. This has to happen before a move is applied, otherwise revert() would
+        restore a wall counted for the old town.
+        """
+        if self._wall_town[PlayerType.LIGHT] != self._p_light.get_town_square() or \
+                self._wall_town[PlayerType.DARK] != self._p_dark.get_town_square():
+            self._count_wall(self._p_light)
+            self._count_wall(self._p_dark)
+
+    def _check_eval_state(self, player: Player, enemy: Player) -> Tuple[int, int, int]:
+        """
+        Returns the size of the player's army, the size of the enemy's army and the amount
+        of the player's soldiers in its defense wall.
+        """
+        self._check_towns()
+        army, enemy_army, wall = self._army[player.get_type()], self._army[enemy.get_type()], self._wall[player.get_type()]
+
+        # the running state is compared to a full recount, which is not stored, so a
+        # drift raises an error instead of being fixed silently
+        if self._debug_hash:
+            counted_wall = popcount(player.get_board() & WALL[DIRECTION[player.get_type()]][player.get_town_square()])
+            if (army, enemy_army, wall) != (player.army_size(), enemy.army_size(), counted_wall):
+                raise ValueError("The evaluation state does not match the board!")
+
+        return army, enemy_army, wall
+
+    def _update_eval_state(self, player: Player, move: Move) -> None:
+        """
+        Updates the armies and the defense walls by the moved and the captured soldier.
+        """
+        player_type = player.get_type()
+        enemy_type = PlayerType.DARK if player_type == PlayerType.LIGHT else PlayerType.LIGHT
+
+        if not move.is_shoot():
+            wall = WALL[DIRECTION[player_type]][self._wall_town[player_type]]
+            self._wall[player_type] += bool(wall & BIT[move.get_square()]) - bool(wall & BIT[move.get_original_square()])
+
+        if move.is_kill_move():
+            wall = WALL[DIRECTION[enemy_type]][self._wall_town[enemy_type]]
+            self._army[enemy_type] -= 1
+            self._wall[enemy_type] -= bool(wall & BIT[move.get_square()])
+
+    def _update_key(self, player: Player, move: Move) -> None:
+        """
+        Updates the running zobrist key by the moved and the captured soldier.
+        """
+        own, other = (0, 2) if player == self._p_light else (2, 0)
+
+        if not move.is_shoot():
+            self._key ^= self._zobrist[move.get_original_square()][own] ^ self._zobrist[move.get_square()][own]
+
+        if move.is_kill_move():
+            self._key ^= self._zobrist[move.get_square()][other]
 
     def eval(self, player: Player, move: Move, weights: List[int]) -> int:
         """
@@ -71,6 +248,7 @@ class CannonGame:
             - the difference of army size
         """
         enemy = self._get_enemy_player(player)
+        army, enemy_army, wall_soldiers = self._check_eval_state(player, enemy)
         value_array = np.zeros_like(weights)
 
         if move.is_finish_move():
@@ -90,11 +268,9 @@ class CannonGame:
         # .sss.
         # .sts.
         #--------
-        tx, ty = player.get_town().get_pos()
-        d = 1 if player.get_type() == PlayerType.DARK else -1
-        for denfense_pos in [(tx - 1, ty + d), (tx, ty + d), (tx + 1, ty + d), (tx - 1, ty), (tx + 1, ty)]:
-            if denfense_pos == move.get_pos() or player.soldier_at(denfense_pos):
-                value_array[3] += 1
+        # the target of a move is never occupied by an own soldier
+        wall = WALL[DIRECTION[player.get_type()]][player.get_town_square()]
+        value_array[3] = wall_soldiers + bool(wall & BIT[move.get_square()])
         
         # moving an enemy that is closer to the town should reward
         # closer to a town is more rewarded
@@ -118,79 +294,145 @@ class CannonGame:
 
         # more soldiers is better 
         kill = 1 if move.is_kill_move() else 0
-        value_array[6] = (player.army_size() - (enemy.army_size() - kill))
+        value_array[6] = (army - (enemy_army - kill))
 
-        return value_array.dot(weights)
+        return value_array.dot(weights).item()
 
-    def execute(self, player: Player, move: Move, testing_only=False) -> None:
+    def eval_position(self, player: Player, weights: np.ndarray) -> int:
+        """
+        Evaluates the position for the given player without a move: only the difference
+        of the army sizes and the soldiers in the defense wall are used, weighted like in
+        eval(). This is much cheaper than evaluating all moves of the player.
         """
-        This method executes the move of a given soldier.
+        enemy = self._get_enemy_player(player)
+        army, enemy_army, wall_soldiers = self._check_eval_state(player, enemy)
+        return (weights[3] * wall_soldiers + weights[6] * (army - enemy_army)).item()
+
+    def eval_batch(self, player: Player, moves: List[Move], weights: np.ndarray) -> List[int]:
         """
-        # get the opponent player
+        Evaluates all given moves at once, the result is the same as calling eval() for 
+        every move. The features of all moves are put into one matrix, which is multiplied
+        with the weights.
+        """
+        if not moves:
+            return []
+
         enemy = self._get_enemy_player(player)
-        soldier = player.soldier_at(move.get_original_pos())
+        army, enemy_army, wall_soldiers = self._check_eval_state(player, enemy)
+        d = DIRECTION[player.get_type()]
+        town = enemy.get_town_square()
+        own_town = player.get_town_square()
+
+        # the features are unpacked from the codes of the moves
+        codes = np.array([m._code for m in moves], dtype=np.int64)
+        origin = (codes >> 5) // 100
+        target = (codes >> 5) % 100
+        kill = (codes & Move.KILL) != 0
+
+        # the distance features are only used if the town can be reached
+        distance = TOWN_DISTANCE[town]
+        reach = TOWN_REACH[town][target]
+        to_distance = distance[target]
+
+        features = np.empty((len(moves), 8), dtype=np.int64)
+        features[:, 0] = np.where(reach, 10 - to_distance, 0)
+        features[:, 1] = np.where(reach, np.maximum(distance[origin] - to_distance, 0), 0)
+        features[:, 2] = (codes & Move.FINISH) != 0
+        features[:, 3] = wall_soldiers + WALL_SQUARES[d][own_town][target]
+        features[:, 4] = (codes & Move.RETREAT) != 0
+        features[:, 5] = (codes & Move.SHOOT) != 0
+        features[:, 6] = army - enemy_army + kill
+        features[:, 7] = kill
+
+        return (features @ weights).tolist()
+
+    def apply(self, player: Player, move: Move) -> None:
+        """
+        Applies a move of the search. Nothing is printed and no callback is called, the
+        state before the move is pushed onto the undo stack, revert() restores it. A 
+        finishing move does not change the board, the search ends there anyway.
+        """
+        self._check_towns()
+
+        stack = self._undo_stack
+        top = self._undo_top
+        if top == len(stack):
+            stack.extend([0] * UNDO_SLOTS)
+
+        army, wall = self._army, self._wall
+        stack[top] = self._p_light.get_board()
+        stack[top + 1] = self._p_dark.get_board()
+        stack[top + 2] = self._key
+        stack[top + 3] = army[PlayerType.LIGHT]
+        stack[top + 4] = army[PlayerType.DARK]
+        stack[top + 5] = wall[PlayerType.LIGHT]
+        stack[top + 6] = wall[PlayerType.DARK]
+        self._undo_top = top + UNDO_SLOTS
+
+        if move.is_finish_move():
+            return
+
+        # a shooting soldier stays where it is, a kill always hits the destination
+        if not move.is_shoot():
+            player.move_soldier(move)
+        if move.is_kill_move():
+            self._get_enemy_player(player).remove_square(move.get_square())
+
+        self._update_key(player, move)
+        self._update_eval_state(player, move)
+
+    def revert(self) -> None:
+        """
+        Reverts the last move of apply(). The boards, the key and the evaluation state 
+        are restored exactly from the undo stack.
+        """
+        top = self._undo_top - UNDO_SLOTS
+        if top < 0:
+            raise ValueError("There is no move to undo!")
+
+        stack = self._undo_stack
+        army, wall = self._army, self._wall
+        self._p_light.restore_board(stack[top])
+        self._p_dark.restore_board(stack[top + 1])
+        self._key = stack[top + 2]
+        army[PlayerType.LIGHT] = stack[top + 3]
+        army[PlayerType.DARK] = stack[top + 4]
+        wall[PlayerType.LIGHT] = stack[top + 5]
+        wall[PlayerType.DARK] = stack[top + 6]
+        self._undo_top = top
+
+    def execute(self, player: Player, move: Move, testing_only=False) -> None:
+        """
+        This method plays the move of a given soldier in the game: the move callback is 
+        called, the move is printed and a finishing move ends the game. The search uses
+        apply() instead, testing_only is only kept for older callers and does the same.
+        """
+        if testing_only:
+            self.apply(player, move)
+            return
+
+        if self._on_move_callback:
+            self._on_move_callback(player, move)
+
+        print(f"{player.get_type()}: {move.get_original_pos()} -> {move.get_pos()}{_describe(move)}")
 
         # if the player won the game, then quit
         if move.is_finish_move():
-            msg = "climbed the town's walls"
-            
-            if move.is_shoot():
-                msg = "bombed the town down"
-
-            if not testing_only:
-                print(f"{player.get_type()}: {soldier.get_pos()} -> {move.get_pos()}, {msg}!")
-                player.move_soldier(move)  
-                self.end_game(player.get_type())
-
-        # remove the enemy soldier if the move is a shoot
-        elif move.is_shoot():
-            if enemy.soldier_at(move.get_pos()):
-                if not testing_only:
-                    print(f"{player.get_type()}: {soldier.get_pos()} -> {move.get_pos()} and hits an enemy!")
-                enemy.remove_at(move.get_pos())
-
-        # remove an enemy if this is a kill move
-        elif move.is_kill_move():
-            if not testing_only:
-                print(f"{player.get_type()}: {soldier.get_pos()} -> {move.get_pos()}, swordfight won!")
-            enemy.remove_at(move.get_pos())
             player.move_soldier(move)
-        
-        # just move the soldier
-        else:
-            msg = "what a rough ground"
-            if move.is_retreat_move():
-                msg = "what a coward"
-            
-            if move.is_sliding_move():
-                msg = "those cannons are heavy"
-
-            if not testing_only:
-                print(f"{player.get_type()}: {soldier.get_pos()} -> {move.get_pos()}, {msg}.")
-            player.move_soldier(move)  
-
-    def undo(self, player: Player, move: Move):
-        enemy = self._get_enemy_player(player)
+            self._key = self._soldiers_key()
+            self._count_eval_state()
+            self.end_game(player.get_type())
+            return
 
-        # get the soldier and move it back to its original position
-        soldier = player.soldier_at(move.get_pos())
-        if soldier:
-            # remove the soldier from the army
-            player.remove_at(move.get_pos())
-
-            # set the soldier to its original position in the army
-            player_army = player.get_soldiers()
-            player_army[move.get_original_pos()] = soldier
-            soldier.set_pos(move.get_original_pos())
-
-        # restore a killed enemy
-        killed = move.get_killed_pos()
-        if killed:
-            enemies_army = enemy.get_soldiers()
-            enemies_army[killed] = CannonSoldier(killed)
-        
-        if not soldier and not killed and not move.is_finish_move():
-            raise ValueError("The move is invalid!")
+        # a played move is not reverted, so its entry is removed from the stack again
+        self.apply(player, move)
+        self._undo_top -= UNDO_SLOTS
+
+    def undo(self, player: Player = None, move: Move = None) -> None:
+        """
+        Reverts the last move executed with testing_only, see revert().
+        """
+        self.revert()
 
     def get_town_positions(self, turn: PlayerType) -> List[Move]:
         """
@@ -230,4 +472,98 @@ class CannonGame:
     
     def set_state(self, state: dict) -> None:
         self._p_light.set_state(state[PlayerType.LIGHT])
-        self._p_dark.set_state(state[PlayerType.DARK])
\ No newline at end of file
+        self._p_dark.set_state(state[PlayerType.DARK])
+        self._key = self._soldiers_key()
+        self._count_eval_state()
+        self._undo_top = 0
+
+    def get_position(self) -> Tuple[int, int, int, int]:
+        """
+        Returns the board as a compact tuple: the bitboards of the light and dark soldiers
+        and the squares of the light and dark town (-1 if not placed).
+        """
+        return self._p_light.get_board(), self._p_dark.get_board(), \
+            self._p_light.get_town_square(), self._p_dark.get_town_square()
+
+    def set_position(self, position: Tuple[int, int, int, int]) -> None:
+        """
+        Sets the board from a tuple created by get_position().
+        """
+        light, dark, light_town, dark_town = position
+        self._p_light.set_board(light, light_town)
+        self._p_dark.set_board(dark, dark_town)
+        self._key = self._soldiers_key()
+        self._count_eval_state()
+        self._undo_top = 0
+
+    def get_position_string(self, player_type: PlayerType) -> str:
+        """
+        Returns the board and the player to move as text, similar to the FEN of chess.
+        The rows are given from y = 0 to y = 9 and separated by "/", each row lists its
+        squares from x = 0 to x = 9: "l" and "d" are light and dark soldiers, "L" and "D" 
+        the towns and a number is the amount of empty squares. The player to move follows
+        as "l" or "d", e.g. "4D5/1d1d1d1d1d/.../10/4L5 d".
+        """
+        light, dark, light_town, dark_town = self.get_position()
+
+        rows = []
+        for y in range(SIZE):
+            row = ""
+            empty = 0
+            for x in range(SIZE):
+                sq = y * SIZE + x
+                piece = "l" if light & BIT[sq] else "d" if dark & BIT[sq] else \
+                    "L" if sq == light_town else "D" if sq == dark_town else None
+
+                if piece is None:
+                    empty += 1
+                    continue
+
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece
+
+            rows.append(row + (str(empty) if empty else ""))
+
+        return "/".join(rows) + " " + ("l" if player_type == PlayerType.LIGHT else "d")
+
+    def set_position_string(self, text: str) -> PlayerType:
+        """
+        Sets the board from a text created by get_position_string() and returns the 
+        player to move.
+        """
+        try:
+            board, turn = text.split()
+            rows = board.split("/")
+            if len(rows) != SIZE or turn not in ("l", "d"):
+                raise ValueError()
+
+            light = dark = 0
+            light_town = dark_town = -1
+            for y, row in enumerate(rows):
+                x = 0
+                for number, piece in re.findall(r"(\d+)|([lLdD])", row):
+                    if number:
+                        x += int(number)
+                        continue
+
+                    sq = y * SIZE + x
+                    if piece == "l":
+                        light |= BIT[sq]
+                    elif piece == "d":
+                        dark |= BIT[sq]
+                    elif piece == "L":
+                        light_town = sq
+                    else:
+                        dark_town = sq
+                    x += 1
+
+                if x != SIZE:
+                    raise ValueError()
+
+        except (ValueError, IndexError):
+            raise ValueError(f"The position {text} is invalid!")
+
+        self.set_position((light, dark, light_town, dark_town))
+        return PlayerType.LIGHT if turn == "l" else PlayerType.DARK
\ No newline at end of file
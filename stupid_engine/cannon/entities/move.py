@@ -1,4 +1,5 @@
 from stupid_engine.cannon.entities.figures import OutOfBounds
+from stupid_engine.cannon.entities.bitboard import POS, square
 from typing import Tuple
 
 
@@ -6,50 +7,99 @@ class Move:
 
     OUT_OF_BOUNDS = OutOfBounds
 
+    # flags of the packed move code. The code is the move key (origin, destination and
+    # the shoot flag) shifted by four bits, followed by the other flags:
+    # (origin * 100 + destination) * 2 + shoot | finish | kill | retreat | slide
+    FINISH = 1
+    KILL = 2
+    RETREAT = 4
+    SLIDE = 8
+    SHOOT = 16
+
+    # the origin of a move without soldier, e.g. the placement of a town
+    NO_SOLDIER = 100
+
+    # a move is only the code and the value, so millions of moves can be created
+    # during a search without a dictionary for each of them
+    __slots__ = ("_code", "_value")
+
     def __init__(self, pos: Tuple[int, int], soldier: Tuple[int, int], value: int = -1,
-                    finish: bool = False, kill: Tuple[int, int] = None, shoot: bool = False, 
+                    finish: bool = False, kill: Tuple[int, int] = None, shoot: bool = False,
                     retreat: bool = False, slide: bool = False) -> None:
-        self._pos = pos
-        
-        self._original_pos = soldier
+        """
+        Creates a move from the positions of the destination and the soldier. The killed
+        soldier is always the one at the destination. The move generator creates the
+        moves by their code using from_code() instead.
+        """
+        origin = square(soldier) if soldier is not None else Move.NO_SOLDIER
+        self._code = Move.encode(origin, square(pos), finish * Move.FINISH | (kill is not None) * Move.KILL |
+                                    shoot * Move.SHOOT | retreat * Move.RETREAT | slide * Move.SLIDE)
         self._value = value
 
-        self._finish = finish
-        self._kill = kill
+    def encode(origin: int, destination: int, flags: int) -> int:
+        """
+        Returns the code of a move of the soldier at the origin square to the destination square.
+        """
+        return (origin * 100 + destination) * 32 + flags
+
+    def from_code(code: int, value: int = -1):
+        move = object.__new__(Move)
+        move._code = code
+        move._value = value
+        return move
 
-        self._retreat = retreat
-        self._shoot = shoot
-        self._slide = slide
+    def get_code(self) -> int:
+        return self._code
 
     def is_finish_move(self) -> bool:
-        return self._finish
+        return self._code & Move.FINISH != 0
 
     def is_kill_move(self) -> bool:
-        return self._kill is not None
+        return self._code & Move.KILL != 0
 
     def is_retreat_move(self) -> bool:
-        return self._retreat
+        return self._code & Move.RETREAT != 0
 
     def is_shoot(self) -> bool:
-        return self._shoot
+        return self._code & Move.SHOOT != 0
 
     def is_sliding_move(self) -> bool:
-        return self._slide
-    
+        return self._code & Move.SLIDE != 0
+
     def set_value(self, value) -> None:
         self._value = value
 
     def get_value(self) -> int:
         return self._value
-    
+
+    def get_square(self) -> int:
+        """
+        Returns the square of the destination.
+        """
+        return (self._code >> 5) % 100
+
+    def get_original_square(self) -> int:
+        """
+        Returns the square of the soldier, or NO_SOLDIER.
+        """
+        return (self._code >> 5) // 100
+
     def get_killed_pos(self) -> Tuple[int, int]:
-        return self._kill
+        return POS[(self._code >> 5) % 100] if self._code & Move.KILL else None
 
     def get_pos(self) -> Tuple[int, int]:
-        return self._pos
-    
+        return POS[(self._code >> 5) % 100]
+
     def get_original_pos(self) -> Tuple[int, int]:
-        return self._original_pos
+        origin = (self._code >> 5) // 100
+        return POS[origin] if origin != Move.NO_SOLDIER else None
+
+    def get_key(self) -> int:
+        """
+        Returns a compact integer built from the origin, the destination and the shoot
+        flag. On a given board this key identifies the move.
+        """
+        return self._code >> 4
 
     def out_of_bounds(pos: Tuple[int, int]) -> bool:
         """
@@ -59,9 +109,4 @@ class Move:
         return x < 0 or 9 < x or y < 0 or 9 < y
 
     def __copy__(self):
-        # get the class and initialize the object
-        obj = type(self).__new__(self.__class__)
-
-        # update the dictionary / values of the object
-        obj.__dict__.update(self.__dict__)
-        return obj
\ No newline at end of file
+        return Move.from_code(self._code, self._value)
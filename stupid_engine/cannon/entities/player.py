@@ -1,7 +1,7 @@
 from stupid_engine.cannon.entities.move import Move
 from stupid_engine.cannon.entities.figures import CannonSoldier, CannonTown
+from stupid_engine.cannon.entities.bitboard import BIT, POS, popcount, square, squares
 from typing import Dict, List, Tuple
-import random
 
 
 class PlayerType:
@@ -17,16 +17,20 @@ class Player:
         """
         self._type = type
         self._town = None
-        self._soldiers = None
+        self._town_sq = -1
         self._selected_soldier = None
         self._ai = None
 
+        # the soldiers are stored as a bitboard, the dictionary of soldier objects is
+        # only a view on this board used by the GUI and is synchronized on demand
+        self._board = 0
+        self._soldiers = dict()
+        self._view_outdated = False
+
         if self._type == PlayerType.LIGHT:
             self._init_positions(start_pos=(1, 8), end_pos=(9, 5))
         elif self._type == PlayerType.DARK:
             self._init_positions(start_pos=(0, 3), end_pos=(8, 0))
-        
-        self._zobrist = [[random.randint(0, 2**64 - 1) for _ in range(10)] for _ in range(10)]
 
     def _init_positions(self, start_pos: Tuple[int, int], end_pos: Tuple[int, int]) -> None:
         """
@@ -35,13 +39,14 @@ class Player:
         :param end_pos: (column, row)
         """
         # this method only can be executed, if the soldiers were not initialized yet
-        if self._soldiers:
+        if self._board:
             return
 
-        self._soldiers = dict()
         for column in range(start_pos[0], end_pos[0] + 1, 2):
             for row in range(start_pos[1], end_pos[1], -1):
-                self._soldiers[(column, row)] = CannonSoldier(init_pos=(column, row))
+                self._board |= BIT[square((column, row))]
+
+        self._view_outdated = True
 
     def is_town_placed(self) -> bool:
         return self._town != None
@@ -53,34 +58,107 @@ class Player:
         if move is None:
             return
 
-        self._town = CannonTown(init_pos=move.get_pos())
+        self._set_town(CannonTown(init_pos=move.get_pos()))
+
+    def _set_town(self, town: CannonTown) -> None:
+        self._town = town
+        self._town_sq = square(town.get_pos()) if town and town.get_pos() else -1
 
     def get_town(self) -> CannonTown:
         return self._town
 
+    def get_town_square(self) -> int:
+        """
+        Returns the square index of the town or -1 if the town was not placed yet.
+        """
+        return self._town_sq
+
+    def get_town_mask(self) -> int:
+        """
+        Returns the bitboard of the town, which is empty if the town was not placed yet.
+        """
+        return BIT[self._town_sq] if self._town_sq >= 0 else 0
+
     def get_type(self) -> PlayerType:
         return self._type
+
+    def get_board(self) -> int:
+        """
+        Returns the bitboard of all soldiers of this player.
+        """
+        return self._board
     
     def get_soldiers(self) -> Dict:
+        """
+        Returns the soldiers as a dictionary of positions and soldier objects. This 
+        view is used by the GUI, the search works on the bitboard directly.
+        """
+        if self._view_outdated:
+            self._sync_view()
+
         return self._soldiers
 
+    def _sync_view(self) -> None:
+        """
+        Updates the dictionary view in place, so references to it stay valid.
+        """
+        positions = set(POS[sq] for sq in squares(self._board))
+        for pos in list(self._soldiers.keys()):
+            if pos not in positions:
+                del self._soldiers[pos]
+
+        for pos in positions:
+            if pos not in self._soldiers:
+                self._soldiers[pos] = CannonSoldier(init_pos=pos)
+
+        self._view_outdated = False
+
     def move_soldier(self, move: Move) -> None:
         """
         This method moves the given soldier to a given position.
         """
-        soldier = self._soldiers[move.get_original_pos()]
-        soldier.set_pos(move.get_pos())
-        self._soldiers[move.get_pos()] = soldier
-        del self._soldiers[move.get_original_pos()]
+        self._board ^= BIT[move.get_original_square()] | BIT[move.get_square()]
+        self._view_outdated = True
+
+    def return_soldier(self, move: Move) -> None:
+        """
+        This method reverts move_soldier() and puts the soldier back to its original position.
+        """
+        self._board ^= BIT[move.get_square()] | BIT[move.get_original_square()]
+        self._view_outdated = True
+
+    def restore_board(self, board: int) -> None:
+        """
+        Sets the bitboard of the soldiers to a board stored before a move, used to undo moves.
+        """
+        self._board = board
+        self._view_outdated = True
 
     def get_state(self) -> Tuple[List[CannonSoldier], CannonTown]:
         """
         This method returns all Soliders and the Town.
         """
-        return self._soldiers, self._town
+        return self.get_soldiers(), self._town
     
     def set_state(self, state) -> None:
-        self._soldiers, self._town = state
+        soldiers, town = state
+        self._set_town(town)
+
+        self._board = 0
+        for pos in soldiers:
+            self._board |= BIT[square(pos)]
+
+        # keep the given dictionary as view, so the state stays comparable
+        self._soldiers = soldiers
+        self._view_outdated = True
+
+    def set_board(self, board: int, town_sq: int) -> None:
+        """
+        Sets the soldiers by a bitboard and the town by its square, -1 removes the town.
+        """
+        self._board = board
+        self._set_town(CannonTown(init_pos=POS[town_sq]) if town_sq >= 0 else None)
+        self._view_outdated = True
 
 
     def set_controller(self, ai) -> None:
@@ -105,7 +183,22 @@ class Player:
         """
         This method removes a soldier at the given position.
         """
-        del self._soldiers[pos]
+        self._board &= ~BIT[square(pos)]
+        self._view_outdated = True
+
+    def remove_square(self, sq: int) -> None:
+        """
+        This method removes a soldier at the given square.
+        """
+        self._board &= ~BIT[sq]
+        self._view_outdated = True
+
+    def add_at(self, pos: Tuple[int, int]) -> None:
+        """
+        This method places a soldier at the given position.
+        """
+        self._board |= BIT[square(pos)]
+        self._view_outdated = True
     
     def select_soldier(self, soldier: CannonSoldier) -> None:
         """
@@ -132,11 +225,12 @@ class Player:
         # this reduced the total runtime of this method from 22s to 2s
         # 90% of runtime saved here
         # obv. O(n) changed to O(1)
-
-        return self._soldiers.get(pos, None)
+        #
+        # the search does not use this method anymore, it tests the bitboard instead
+        return self.get_soldiers().get(pos, None)
     
     def army_size(self) -> int:
         """
         Returns the amount of soliders.
         """
-        return len(self._soldiers.keys())
+        return popcount(self._board)
@@ -70,6 +70,32 @@ class Application(GameController):
         else:
             self._p_dark.set_controller(ai(self._p_dark, self._cannon))
     
+    def start_game(self) -> None:
+        """
+        Starts the game. If no human plays, both AIs run in this process and pondering 
+        would only take CPU time from the opponent, so it is turned off.
+        """
+        controllers = [self._p_light.get_controller(), self._p_dark.get_controller()]
+        if not any(isinstance(controller, Human) for controller in controllers):
+            for controller in controllers:
+                controller.set_ponder(False)
+
+        super().start_game()
+
+    def run(self) -> None:
+        """
+        Runs the game loop. The loop ends when the game is finished or the window is 
+        closed, then the AIs are closed in this thread, so no search is running anymore:
+        pondering threads are stopped and worker processes are released.
+        """
+        try:
+            super().run()
+        finally:
+            for player in (self._p_light, self._p_dark):
+                controller = player.get_controller()
+                if controller:
+                    controller.close()
+
     def load_game(self) -> None:
         with open("savegame.se", "rb") as f:
             state = pickle.load(f)
@@ -0,0 +1,162 @@
+"""
+Plays games between AIs without any window, pygame is not imported here. The games
+can be run in a pool of processes, e.g. to build an opening book or to compare two
+versions of the engine.
+"""
+import math
+import multiprocessing
+import os
+import random
+from contextlib import redirect_stdout
+from stupid_engine.cannon.ai.alphabeta import AlphaBeta
+from stupid_engine.cannon.ai.random import RandomAI
+from stupid_engine.cannon.entities.cannon import CannonGame
+from stupid_engine.cannon.entities.player import Player, PlayerType
+from typing import Dict, Iterator, List, Tuple
+
+
+# a game is a draw if there is no winner after this amount of moves
+MAX_PLIES = 300
+
+# weights of the evaluation used in main.py for the light player
+DEFAULT_WEIGHTS = [1, 1, 5, 3, 2, 3, 2, 0]
+
+# keys of the dictionary created by AlphaBeta.to_dict() for the constructor arguments
+CONFIG_KEYS = {"alpha": "a", "beta": "b", "depth": "d", "time_limit": "t", "weights": "w",
+                "use_tt": "r", "always_sort": "s", "quiesence": "q", "soft_bounds": "sb", "pvs": "pv",
+                "null_move": "nm", "lmr": "lmr", "tt_entries": "tte", "tt_mb": "ttm", "workers": "wk",
+                "lazy_smp": "smp", "ponder": "po", "book": "bk", "profile": "pf",
+                "stats": "st", "qs_tt": "qtt"}
+
+
+def engine_config(depth: int = 2, time_limit: float = None, weights: List[int] = DEFAULT_WEIGHTS, **options) -> Dict:
+    """
+    Returns the configuration of an AlphaBeta AI as created by its to_dict() method. The
+    options are given by the names of the arguments of the AlphaBeta constructor.
+    """
+    config = {"ai_type": "ab", "a": -math.inf, "b": math.inf, "d": depth, "t": time_limit, "w": weights,
+                "r": True, "s": True}
+
+    for name, value in options.items():
+        if name not in CONFIG_KEYS:
+            raise ValueError(f"Unknown option of the AlphaBeta AI: {name}")
+        config[CONFIG_KEYS[name]] = value
+
+    return config
+
+
+def random_config(delay: float = 0) -> Dict:
+    """
+    Returns the configuration of a RandomAI, by default without any delay.
+    """
+    return {"ai_type": "random", "dl": delay}
+
+
+def create_ai(config: Dict, player: Player, cannon: CannonGame):
+    """
+    Creates the AI described by the dictionary of its to_dict() method.
+    """
+    if config["ai_type"] == "ab":
+        return AlphaBeta.from_dict(config, player, cannon)
+
+    if config["ai_type"] == "random":
+        return RandomAI.from_dict(config, player, cannon)
+
+    raise ValueError(f"The AI type {config['ai_type']} can not play headless.")
+
+
+class HeadlessGame:
+    def __init__(self, light: Dict, dark: Dict, max_plies: int = MAX_PLIES) -> None:
+        """
+        A game between two AIs given by their configurations. Like in the game with window,
+        dark places its town first, then light and afterwards dark makes the first move.
+        """
+        self._p_light = Player(PlayerType.LIGHT)
+        self._p_dark = Player(PlayerType.DARK)
+        self._cannon = CannonGame(self._p_light, self._p_dark)
+        self._cannon.set_on_finish(self._on_finish)
+        self._cannon.set_on_move(self._on_move)
+
+        self._p_light.set_controller(create_ai(light, self._p_light, self._cannon))
+        self._p_dark.set_controller(create_ai(dark, self._p_dark, self._cannon))
+
+        # both AIs run in this process, pondering would only slow down the opponent
+        for player in (self._p_light, self._p_dark):
+            player.get_controller().set_ponder(False)
+
+        self._max_plies = max_plies
+        self._winner = None
+        self._finished = False
+        self._last_move = None
+
+    def _on_finish(self, player_type: PlayerType) -> None:
+        self._winner = player_type
+        self._finished = True
+
+    def _on_move(self, player: Player, move) -> None:
+        self._last_move = move
+
+    def play(self) -> Dict:
+        """
+        Plays the game and returns its record: the winner (None on a draw), the amount of
+        moves, the town squares (dark, light) and the played moves as list of (zobrist key
+        before the move, move key).
+        """
+        active, other = self._p_dark, self._p_light
+        for player in (active, other):
+            player.place_town(self._cannon.get_town_positions(player.get_type()))
+
+        moves = []
+        while not self._finished and len(moves) < self._max_plies:
+            key = self._cannon.hash(active.get_type())
+            self._last_move = None
+            active.get_controller().play_turn(self._cannon.get_state())
+
+            if self._last_move is not None:
+                moves.append((key, self._last_move.get_key()))
+
+            active, other = other, active
+
+        for player in (self._p_light, self._p_dark):
+            player.get_controller().close()
+
+        return {"w": self._winner, "p": len(moves),
+                "t": (self._p_dark.get_town_square(), self._p_light.get_town_square()), "m": moves}
+
+
+def play_game(job: Tuple[Dict, Dict, int, int]) -> Dict:
+    """
+    Plays a single game given as (light config, dark config, seed, max plies). The seed
+    makes the random town placement reproducible. The output of the AIs is discarded.
+    """
+    light, dark, seed, max_plies = job
+    random.seed(seed)
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        record = HeadlessGame(light, dark, max_plies).play()
+
+    record["seed"] = seed
+    return record
+
+
+def _play_indexed(item: Tuple[int, Tuple[Dict, Dict, int, int]]) -> Dict:
+    index, job = item
+    record = play_game(job)
+    record["game"] = index
+    return record
+
+
+def play_games(jobs: List[Tuple[Dict, Dict, int, int]], workers: int = None) -> Iterator[Dict]:
+    """
+    Plays the given games in a pool of processes and yields their records as soon as a
+    game is finished, the index of the job is stored as "game". By default one process 
+    per CPU is used. If the caller stops the iteration, the remaining games are cancelled.
+    """
+    if workers == 1:
+        for item in enumerate(jobs):
+            yield _play_indexed(item)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for record in pool.imap_unordered(_play_indexed, enumerate(jobs)):
+            yield record
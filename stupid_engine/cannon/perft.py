@@ -0,0 +1,164 @@
+"""
+Counts the leaf nodes of the game tree to a given depth (perft). This measures the
+move generator together with apply() and revert() and checks it against counts of
+known positions, so a faster generator can be verified to generate the same moves.
+
+Usage: python -m stupid_engine.cannon.perft [--position TEXT] [--depth N] [--divide] [--check]
+"""
+import argparse
+import time
+from stupid_engine.cannon.ai.move_generator import MoveGenerator
+from stupid_engine.cannon.entities.cannon import CannonGame
+from stupid_engine.cannon.entities.move import Move
+from stupid_engine.cannon.entities.player import Player, PlayerType
+from typing import Dict, List, Tuple
+
+
+# reference positions (name, position string) and the expected amount of leaf nodes for
+# each depth. The moves are generated like in the search, if the town can be captured
+# only this move is generated. The game ends after capturing the town
+PERFT_POSITIONS = [
+    ("start", "4D5/d1d1d1d1d1/d1d1d1d1d1/d1d1d1d1d1/10/10/1l1l1l1l1l/1l1l1l1l1l/1l1l1l1l1l/5L4 d",
+        {1: 41, 2: 1699, 3: 69754}),
+    ("start-edge", "1D8/d1d1d1d1d1/d1d1d1d1d1/d1d1d1d1d1/10/10/1l1l1l1l1l/1l1l1l1l1l/1l1l1l1l1l/8L1 d",
+        {1: 42, 2: 1782, 3: 74517}),
+    ("opening", "2D1d5/d3d1d1d1/dd2d1d1d1/d1d5d1/10/10/1l1l1l1l1l/1lll1l3l/1l3l1l1l/3L6 d",
+        {1: 33, 2: 1292, 3: 42533}),
+    ("middle", "d1D7/d8d/d1d1ddd3/2d1d5/2d7/1l2l1l3/3ll1l1l1/7l2/1l5l1l/1L8 d",
+        {1: 28, 2: 794, 3: 22478}),
+    ("middle-2", "d2D6/d7d1/d4d4/6d3/2d3l3/9d/l2l1l1l2/l2l3l1l/10/6L3 d",
+        {1: 19, 2: 463, 3: 9738}),
+    ("late", "3D6/10/10/l9/8d1/10/4d5/10/2d7/4L5 d",
+        {1: 9, 2: 18, 3: 130, 4: 320}),
+    ("late-2", "4D5/10/10/2ll3d2/4l5/5d3l/9l/8ll/1l8/3L6 d",
+        {1: 7, 2: 143, 3: 1041, 4: 21150}),
+    ("late-3", "4D5/l9/3d4d1/1d3d3d/3l4d1/10/1l8/9l/10/4L2d2 d",
+        {1: 15, 2: 162, 3: 2791, 4: 32115}),
+    ("town-shot", "3l4D1/7l2/10/10/10/8ll/10/1d1l6/10/d7L1 l",
+        {1: 1, 2: 0, 3: 0}),
+]
+
+
+def perft(cannon: CannonGame, player: Player, depth: int, generator: MoveGenerator = None) -> int:
+    """
+    Returns the amount of positions reached after exactly depth moves.
+    """
+    if depth == 0:
+        return 1
+
+    if generator is None:
+        generator = MoveGenerator()
+
+    enemy = cannon._get_enemy_player(player)
+    moves = generator.generate_moves(player, enemy)
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        # the game is over after capturing the town
+        if move.is_finish_move():
+            continue
+
+        cannon.apply(player, move)
+        nodes += perft(cannon, enemy, depth - 1, generator)
+        cannon.revert()
+
+    return nodes
+
+
+def move_name(move: Move) -> str:
+    """
+    Returns the move as text "(x, y) -> (x, y)" followed by its flags: f(inish), k(ill),
+    s(hoot), r(etreat) and c(annon slide).
+    """
+    flags = "".join(flag for flag, is_set in [("f", move.is_finish_move()), ("k", move.is_kill_move()),
+                    ("s", move.is_shoot()), ("r", move.is_retreat_move()), ("c", move.is_sliding_move())] if is_set)
+    return f"{move.get_original_pos()} -> {move.get_pos()} {flags}".strip()
+
+
+def divide(cannon: CannonGame, player: Player, depth: int) -> List[Tuple[str, int]]:
+    """
+    Returns the perft count of each move of the position, the move is given as text.
+    """
+    generator = MoveGenerator()
+    enemy = cannon._get_enemy_player(player)
+
+    counts = []
+    for move in generator.generate_moves(player, enemy):
+        name = move_name(move)
+
+        if depth <= 1 or move.is_finish_move():
+            counts.append((name, 1 if depth <= 1 else 0))
+            continue
+
+        cannon.apply(player, move)
+        counts.append((name, perft(cannon, enemy, depth - 1, generator)))
+        cannon.revert()
+
+    return counts
+
+
+def create_game(position: str) -> Tuple[CannonGame, Player]:
+    """
+    Returns a game set to the given position string and the player to move.
+    """
+    cannon = CannonGame(Player(PlayerType.LIGHT), Player(PlayerType.DARK))
+    player_type = cannon.set_position_string(position)
+    return cannon, cannon.get_player(player_type)
+
+
+def check(max_depth: int = None, verbose: bool = True) -> bool:
+    """
+    Compares the perft counts of all reference positions with the expected counts.
+    Returns true if all counts match.
+    """
+    ok = True
+    nodes = 0
+    start = time.time()
+    for name, position, expected in PERFT_POSITIONS:
+        cannon, player = create_game(position)
+        for depth, count in expected.items():
+            if max_depth is not None and depth > max_depth:
+                continue
+
+            result = perft(cannon, player, depth)
+            nodes += result
+            ok = ok and result == count
+            if verbose:
+                print(f"{name:<12} depth {depth}: {result:>10} {'ok' if result == count else f'expected {count}'}")
+
+    if verbose:
+        elapsed = time.time() - start
+        print(f"{nodes} nodes in {elapsed:.2f}s, {nodes / max(elapsed, 1e-9):.0f} nodes per second")
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counts the leaf nodes of the game tree.")
+    parser.add_argument("--position", help="position string, by default the reference positions are used")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the count of each move")
+    parser.add_argument("--check", action="store_true", help="compare the reference positions with the expected counts")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.depth) else 1)
+
+    positions = [args.position] if args.position else [position for _, position, _ in PERFT_POSITIONS]
+    for position in positions:
+        cannon, player = create_game(position)
+        print(position)
+
+        start = time.time()
+        if args.divide:
+            counts = divide(cannon, player, args.depth)
+            for name, count in counts:
+                print(f"\t{name}: {count}")
+            nodes = sum(count for _, count in counts)
+        else:
+            nodes = perft(cannon, player, args.depth)
+        elapsed = time.time() - start
+
+        print(f"depth {args.depth}: {nodes} nodes in {elapsed:.2f}s, {nodes / max(elapsed, 1e-9):.0f} nodes per second\n")
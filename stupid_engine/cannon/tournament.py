@@ -0,0 +1,213 @@
+"""
+Plays a match between two engines without any window and reports the result as
+Elo difference. A sequential probability ratio test (SPRT) stops the match as soon
+as one of the hypotheses elo0 (the change is not better) or elo1 (the change is
+better) is accepted.
+
+Usage: python -m stupid_engine.cannon.tournament --a "depth=2,pvs=True" --b "depth=2" [--games N] [--workers N]
+"""
+import argparse
+import ast
+import math
+from stupid_engine.cannon.headless import MAX_PLIES, engine_config, play_games, random_config
+from stupid_engine.cannon.entities.player import PlayerType
+from typing import Dict, Tuple
+
+
+# defaults of the SPRT: the Elo hypotheses and the error probabilities
+SPRT_ELO0 = 0
+SPRT_ELO1 = 10
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+
+# quantile of the normal distribution used for the error bars (95%)
+CONFIDENCE_Z = 1.96
+
+
+def elo(score: float) -> float:
+    """
+    Returns the Elo difference of the given expected score.
+    """
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+
+    return -400 * math.log10(1 / score - 1)
+
+
+def expected_score(elo_difference: float) -> float:
+    return 1 / (1 + 10 ** (-elo_difference / 400))
+
+
+class MatchResult:
+    def __init__(self, elo0: float = SPRT_ELO0, elo1: float = SPRT_ELO1,
+                    alpha: float = SPRT_ALPHA, beta: float = SPRT_BETA) -> None:
+        """
+        Counts the wins, draws and losses of engine A and calculates the statistics of
+        the match. The SPRT uses the normal approximation of the log likelihood ratio,
+        the match can be stopped if it leaves the bounds given by alpha and beta.
+        """
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+        self._elo0 = elo0
+        self._elo1 = elo1
+        self._lower = math.log(beta / (1 - alpha))
+        self._upper = math.log((1 - beta) / alpha)
+
+    def add(self, result: float) -> None:
+        """
+        Adds the result of a game from the view of engine A: 1, 0.5 or 0.
+        """
+        if result == 1:
+            self.wins += 1
+        elif result == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def score(self) -> float:
+        return (self.wins + 0.5 * self.draws) / self.games() if self.games() else 0.5
+
+    def variance(self) -> float:
+        """
+        Returns the variance of the result of a single game. If all games ended the same,
+        half a game of each result is added, the normal approximation needs a variance.
+        """
+        n = self.games()
+        if n == 0:
+            return 0
+
+        wins, draws, losses = self.wins, self.draws, self.losses
+        if n in (wins, draws, losses):
+            wins, draws, losses, n = wins + 0.5, draws + 0.5, losses + 0.5, n + 1.5
+
+        s = (wins + 0.5 * draws) / n
+        return (wins * (1 - s) ** 2 + draws * (0.5 - s) ** 2 + losses * s ** 2) / n
+
+    def elo(self) -> Tuple[float, float]:
+        """
+        Returns the Elo difference of engine A and the half width of its 95% interval.
+        """
+        n = self.games()
+        score = self.score()
+        if n == 0:
+            return 0, math.inf
+
+        error = CONFIDENCE_Z * math.sqrt(self.variance() / n)
+        low, high = elo(max(score - error, 0)), elo(min(score + error, 1))
+        if math.isinf(low) or math.isinf(high):
+            return elo(score), math.inf
+
+        return elo(score), (high - low) / 2
+
+    def llr(self) -> float:
+        """
+        Returns the log likelihood ratio of the hypotheses elo1 against elo0.
+        """
+        variance = self.variance()
+        if variance == 0:
+            return 0
+
+        s0, s1 = expected_score(self._elo0), expected_score(self._elo1)
+        return self.games() * (s1 - s0) * (2 * self.score() - s0 - s1) / (2 * variance)
+
+    def decision(self) -> str:
+        """
+        Returns "H1" if engine A is better, "H0" if it is not, or None if more games
+        are needed.
+        """
+        llr = self.llr()
+        if llr >= self._upper:
+            return "H1"
+        if llr <= self._lower:
+            return "H0"
+
+        return None
+
+    def get_printable(self) -> str:
+        elo_diff, error = self.elo()
+        return f"Games: {self.games()} (+{self.wins} ={self.draws} -{self.losses})\n" + \
+            f"Score: \t{self.score():.3f}\n" + \
+            f"Elo: \t{elo_diff:.1f} +- {error:.1f}\n" + \
+            f"LLR: \t{self.llr():.2f} ({self._lower:.2f}, {self._upper:.2f}) {self.decision() or ''}"
+
+    def to_dict(self) -> dict:
+        elo_diff, error = self.elo()
+        return {"games": self.games(), "wins": self.wins, "draws": self.draws, "losses": self.losses,
+                "score": self.score(), "elo": elo_diff, "error": error, "llr": self.llr(),
+                "decision": self.decision()}
+
+
+def run_match(engine_a: Dict, engine_b: Dict, games: int, workers: int = None, sprt: bool = True,
+                max_plies: int = MAX_PLIES, result: MatchResult = None, verbose: bool = False) -> MatchResult:
+    """
+    Plays up to the given amount of games between the two engine configurations. The
+    colours alternate and both games of a pair use the same seed, so both engines play
+    the same town placements. With sprt the match stops once a hypothesis is accepted.
+    """
+    if result is None:
+        result = MatchResult()
+
+    jobs = []
+    for game in range(games):
+        pair = game // 2
+        if game % 2 == 0:
+            jobs.append((engine_a, engine_b, pair, max_plies))
+        else:
+            jobs.append((engine_b, engine_a, pair, max_plies))
+
+    records = play_games(jobs, workers)
+    for record in records:
+        a_colour = PlayerType.LIGHT if record["game"] % 2 == 0 else PlayerType.DARK
+        if record["w"] is None:
+            result.add(0.5)
+        else:
+            result.add(1 if record["w"] == a_colour else 0)
+
+        if verbose:
+            print(result.get_printable(), end="\n\n")
+
+        if sprt and result.decision():
+            records.close()
+            break
+
+    return result
+
+
+def parse_engine(text: str) -> Dict:
+    """
+    Creates an engine configuration of a text like "depth=2,quiesence=False". The text
+    "random" configures the RandomAI.
+    """
+    if text.strip() == "random":
+        return random_config()
+
+    # the options are parsed like keyword arguments, so lists like the weights work
+    call = ast.parse(f"engine({text})", mode="eval").body
+    options = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords}
+
+    return engine_config(**options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays a match between two engines.")
+    parser.add_argument("--a", default="", help="options of engine A, e.g. \"depth=2,pvs=True\"")
+    parser.add_argument("--b", default="", help="options of engine B or \"random\"")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--plies", type=int, default=MAX_PLIES, help="a game is a draw after this many moves")
+    parser.add_argument("--elo0", type=float, default=SPRT_ELO0)
+    parser.add_argument("--elo1", type=float, default=SPRT_ELO1)
+    parser.add_argument("--no-sprt", action="store_true", help="play all games")
+    args = parser.parse_args()
+
+    result = MatchResult(args.elo0, args.elo1)
+    run_match(parse_engine(args.a), parse_engine(args.b), args.games, args.workers, not args.no_sprt,
+                args.plies, result, verbose=True)
+    print(result.get_printable())
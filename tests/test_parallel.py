@@ -0,0 +1,19 @@
+from stupid_engine.cannon.headless import create_ai, engine_config
+from stupid_engine.cannon.perft import PERFT_POSITIONS, create_game
+
+
+def test_root_split_counts_nodes_per_search():
+    # at depth one the root moves are only evaluated, so every search visits the same nodes
+    cannon, player = create_game(PERFT_POSITIONS[1][1])
+    ai = create_ai(engine_config(depth=1, workers=2, use_tt=False), player, cannon)
+
+    try:
+        ai._run_search()
+        first = ai._search_nodes()
+        ai._run_search()
+        second = ai._search_nodes()
+    finally:
+        ai.close()
+
+    assert first > 0
+    assert first == second
@@ -0,0 +1,22 @@
+import math
+
+from stupid_engine.cannon.headless import create_ai, engine_config
+from stupid_engine.cannon.perft import create_game
+
+
+# light has a single soldier, dark has only its town left
+NO_DARK_SOLDIERS = "3D6/10/10/10/10/10/10/10/1l8/4L5 l"
+
+
+def test_leaf_without_moves_is_lost():
+    # the leaves of a search without quiescence are reached by dark, which has no move
+    cannon, player = create_game(NO_DARK_SOLDIERS)
+    ai = create_ai(engine_config(depth=1, quiesence=False), player, cannon)
+
+    try:
+        move, _ = ai._run_search()
+    finally:
+        ai.close()
+
+    assert move is not None
+    assert ai._completed_score == math.inf